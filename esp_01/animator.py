@@ -0,0 +1,117 @@
+"""
+Fixed rate animation scheduler for the WS2812 driver in neo2.py.
+
+Drives animation generators at a target frame rate using ticks_us deadlines.
+A generator may yield a list of (R, G, B) tuples like neo2.animation_1, which
+is passed to stripe.show(), or draw into stripe.frame (or a bytearray of the
+same size) like neo2.frame_animation_1, which is shown with stripe.commit().
+
+    import animator
+    import neo2
+
+    stripe = neo2.WS2812(spi_bus=1, led_count=240, intensity=0.05, gc_every=0)
+    scheduler = animator.Scheduler(stripe, fps=30)
+    scheduler.play(neo2.animation_3(stripe.led_count), 5000)
+    print(scheduler.stats())
+"""
+
+import utime as time
+
+
+class Scheduler:
+    def __init__(self, stripe, fps=30, catch_up=False, idle_us=5000):
+        """
+        Params:
+        * stripe = neo2.WS2812 driver
+        * fps = target frames per second
+        * catch_up = when frames are dropped, still step the generator once
+          for each of them so the animation keeps its speed
+        * idle_us = spare time before a deadline needed to call stripe.idle()
+          (only done when the stripe's gc_every is 0)
+        """
+        self.stripe = stripe
+        self.fps = fps
+        self.period_us = 1000000 // fps
+        self.catch_up = catch_up
+        self.idle_us = idle_us
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.frames = 0
+        self.late = 0
+        self.dropped = 0
+        self.worst_us = 0
+        self.started = time.ticks_us()
+
+    def show(self, frame):
+        if isinstance(frame, bytearray):
+            self.stripe.commit(frame)
+        else:
+            self.stripe.show(frame)
+
+    def play(self, animation, duration_ms):
+        """
+        Show frames of one animation for duration_ms milliseconds.
+        """
+        period = self.period_us
+        stripe = self.stripe
+        start = time.ticks_us()
+        end = time.ticks_add(start, duration_ms * 1000)
+        deadline = start
+
+        while time.ticks_diff(end, deadline) > 0:
+            frame_start = time.ticks_us()
+            self.show(next(animation))
+            now = time.ticks_us()
+
+            elapsed = time.ticks_diff(now, frame_start)
+            if elapsed > self.worst_us:
+                self.worst_us = elapsed
+            self.frames += 1
+
+            deadline = time.ticks_add(deadline, period)
+            behind = time.ticks_diff(now, deadline)
+            if behind > 0:
+                # over budget: skip the frames we no longer have time for
+                self.late += 1
+                missed = behind // period + 1
+                self.dropped += missed - 1
+                deadline = time.ticks_add(deadline, (missed - 1) * period)
+                if self.catch_up:
+                    for i in range(missed - 1):
+                        next(animation)
+            else:
+                if stripe.gc_every == 0 and -behind > self.idle_us:
+                    stripe.idle()
+                wait = time.ticks_diff(deadline, time.ticks_us())
+                if wait > 0:
+                    time.sleep_us(wait)
+
+    def run(self, playlist, loop=True):
+        """
+        Play a list of (animation, duration_ms) in order, looping forever
+        unless loop is False. Generators keep their state between loops;
+        pass a function instead of a generator to start it afresh every time.
+        """
+        while True:
+            for animation, duration_ms in playlist:
+                if callable(animation):
+                    animation = animation()
+                self.play(animation, duration_ms)
+            if not loop:
+                break
+
+    def stats(self):
+        """
+        Returns a dict with frames shown, achieved fps, late frames, dropped
+        frames and worst frame time in us since the last reset_stats().
+        """
+        elapsed = time.ticks_diff(time.ticks_us(), self.started)
+        fps = self.frames * 1000000 / elapsed if elapsed > 0 else 0
+        return {
+            'frames': self.frames,
+            'fps': fps,
+            'late': self.late,
+            'dropped': self.dropped,
+            'worst_us': self.worst_us,
+        }
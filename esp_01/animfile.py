@@ -0,0 +1,96 @@
+"""
+Pre-rendered animation files for the WS2812 driver in neo2.py.
+
+Run an animation generator ahead of time and save its frames, then play them
+back with WS2812.play_file() without computing anything per pixel:
+
+    import animfile
+    import neo2
+
+    animfile.record('/sd/anim3.wsa', neo2.animation_3(240), 240, 480, intensity=0.05)
+
+    stripe = neo2.WS2812(spi_bus=1, led_count=240)
+    stripe.play_file('/sd/anim3.wsa')
+
+File layout: a 12 byte header followed by frame_count frames of equal size.
+
+    magic       4s  b'WSA1'
+    fmt         B   FMT_SPI: frames are the SPI buffer, 12 bytes per LED
+                    FMT_RGB: frames are raw RGB, 3 bytes per LED
+    reserved    B
+    led_count   H
+    frame_count H
+    fps         H
+
+SPI frames are read straight into the driver's SPI buffer, so intensity is
+fixed at record time. RGB frames are a quarter of the size and go through
+the driver's frame buffer and commit(), so they follow the driver's intensity
+and correction but cost the encoding per frame.
+"""
+
+import struct
+
+MAGIC = b'WSA1'
+HEADER = '<4sBBHHH'
+HEADER_SIZE = struct.calcsize(HEADER)
+
+FMT_SPI = 0
+FMT_RGB = 1
+
+
+def frame_size(fmt, led_count):
+    return led_count * (12 if fmt == FMT_SPI else 3)
+
+
+def read_header(f):
+    """
+    Returns (fmt, led_count, frame_count, fps) of an open animation file.
+    """
+    magic, fmt, reserved, led_count, frame_count, fps = struct.unpack(HEADER, f.read(HEADER_SIZE))
+    if magic != MAGIC:
+        raise ValueError('Not an animation file')
+    return fmt, led_count, frame_count, fps
+
+
+def record(path, animation, led_count, frame_count, fmt=FMT_SPI, intensity=1.0, fps=30):
+    """
+    Save frame_count frames of an animation generator to path.
+
+    The generator may yield lists of (R, G, B) tuples like neo2.animation_1
+    or an RGB bytearray like neo2.frame_animation_1.
+    """
+    if fmt == FMT_SPI:
+        # only needed for the encoding table
+        from neo2 import WS2812
+        lut = WS2812.build_lut(intensity)
+    buf = bytearray(frame_size(fmt, led_count))
+
+    with open(path, 'wb') as f:
+        f.write(struct.pack(HEADER, MAGIC, fmt, 0, led_count, frame_count, fps))
+        for i in range(frame_count):
+            data = next(animation)
+            if isinstance(data, (bytes, bytearray)):
+                data = zip(data[0::3], data[1::3], data[2::3])
+
+            index = 0
+            if fmt == FMT_SPI:
+                for red, green, blue in data:
+                    if index >= len(buf):
+                        break
+                    buf[index:index+4] = lut[green]
+                    buf[index+4:index+8] = lut[red]
+                    buf[index+8:index+12] = lut[blue]
+                    index += 12
+                for index in range(index, len(buf), 4):
+                    buf[index:index+4] = lut[0]
+            else:
+                for red, green, blue in data:
+                    if index >= len(buf):
+                        break
+                    buf[index] = red
+                    buf[index+1] = green
+                    buf[index+2] = blue
+                    index += 3
+                for index in range(index, len(buf)):
+                    buf[index] = 0
+            f.write(buf)
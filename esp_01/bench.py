@@ -0,0 +1,91 @@
+"""
+Micro-benchmarks for the LED code. Run them on the board from the REPL:
+
+    import bench
+    bench.encode()
+"""
+
+import utime as time
+
+import colorgen
+from neo2 import WS2812, animation_3, color_gen
+
+
+def update_buf_bitwise(stripe, data, start=0):
+    # The original WS2812.update_buf, kept here as the baseline
+    buf = stripe.buf
+    buf_bytes = stripe.buf_bytes
+    intensity = stripe.intensity
+
+    mask = 0x03
+    index = start * 12
+    for red, green, blue in data:
+        red = int(red * intensity)
+        green = int(green * intensity)
+        blue = int(blue * intensity)
+
+        buf[index] = buf_bytes[green >> 6 & mask]
+        buf[index+1] = buf_bytes[green >> 4 & mask]
+        buf[index+2] = buf_bytes[green >> 2 & mask]
+        buf[index+3] = buf_bytes[green & mask]
+
+        buf[index+4] = buf_bytes[red >> 6 & mask]
+        buf[index+5] = buf_bytes[red >> 4 & mask]
+        buf[index+6] = buf_bytes[red >> 2 & mask]
+        buf[index+7] = buf_bytes[red & mask]
+
+        buf[index+8] = buf_bytes[blue >> 6 & mask]
+        buf[index+9] = buf_bytes[blue >> 4 & mask]
+        buf[index+10] = buf_bytes[blue >> 2 & mask]
+        buf[index+11] = buf_bytes[blue & mask]
+
+        index += 12
+
+    return index // 12
+
+
+def encode(led_count=240, frames=20, intensity=0.05):
+    """
+    Compare the bit twiddling encoder with the table driven update_buf.
+    Prints microseconds per LED for each.
+    """
+    stripe = WS2812(spi_bus=1, led_count=led_count, intensity=intensity)
+    data = next(animation_3(led_count))
+    leds = led_count * frames
+
+    start = time.ticks_us()
+    for i in range(frames):
+        update_buf_bitwise(stripe, data)
+    before = time.ticks_diff(time.ticks_us(), start)
+    reference = bytes(stripe.buf)
+
+    start = time.ticks_us()
+    for i in range(frames):
+        stripe.update_buf(data)
+    after = time.ticks_diff(time.ticks_us(), start)
+
+    print('bitwise: {:.2f} us/LED'.format(before / leds))
+    print('lut:     {:.2f} us/LED'.format(after / leds))
+    print('match:   {}'.format(bytes(stripe.buf) == reference))
+
+
+def colors(count=2000):
+    """
+    Compare neo2.color_gen (math.sin) with the table driven colorgen.
+    Prints colours generated per second for each.
+    """
+    for name, gen in (('math.sin', color_gen()),
+                      ('table', colorgen.color_gen())):
+        start = time.ticks_us()
+        for i in range(count):
+            next(gen)
+        elapsed = time.ticks_diff(time.ticks_us(), start)
+        print('{:9} {} colors/s'.format(name + ':', count * 1000000 // elapsed))
+
+    gen = colorgen.color_gen()
+    buf = bytearray(3)
+    start = time.ticks_us()
+    for i in range(count):
+        gen.next_into(buf)
+    elapsed = time.ticks_diff(time.ticks_us(), start)
+    print('{:9} {} colors/s'.format('into:', count * 1000000 // elapsed))
@@ -0,0 +1,92 @@
+"""
+Colour generator built on fixed-point phase accumulators and a sine table.
+
+Drop-in for neo2.color_gen without any math.sin or float division per colour:
+
+    import colorgen
+    colors = colorgen.color_gen()
+    red, green, blue = next(colors)
+
+Each channel has a 16-bit phase that advances by a fixed step every colour.
+The top 8 bits index a 256 entry table of (1 + sin) * 127 + 1.
+"""
+
+import math
+
+TABLE_SIZE = 256
+PHASE_ONE = 65536  # one full turn of the phase accumulator
+
+
+def build_sine_table():
+    table = bytearray(TABLE_SIZE)
+    for i in range(TABLE_SIZE):
+        table[i] = int((1 + math.sin(2 * math.pi * i / TABLE_SIZE)) * 127 + 1)
+    return table
+
+
+SINE = build_sine_table()
+
+
+def radians_to_phase(angle):
+    return int(angle * PHASE_ONE / (2 * math.pi)) % PHASE_ONE
+
+
+class ColorGen:
+    """
+    Iterator over (R, G, B) colours, normalised so the channels add up to
+    about 255 like neo2.color_gen.
+
+    Params:
+    * freqs = (R, G, B) step of each channel in radians per colour
+    * phases = (R, G, B) starting angle of each channel in radians
+    * seq = number of steps to skip, like the seq argument of color_gen
+    """
+    def __init__(self, freqs=(0.1, 0.1324, 0.1654), phases=(0, 0, 0), seq=0):
+        self.step_r = radians_to_phase(freqs[0])
+        self.step_g = radians_to_phase(freqs[1])
+        self.step_b = radians_to_phase(freqs[2])
+
+        # color_gen increments before the first colour
+        seq += 1
+        self.phase_r = (radians_to_phase(phases[0]) + seq * self.step_r) % PHASE_ONE
+        self.phase_g = (radians_to_phase(phases[1]) + seq * self.step_g) % PHASE_ONE
+        self.phase_b = (radians_to_phase(phases[2]) + seq * self.step_b) % PHASE_ONE
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        sine = SINE
+        red = sine[self.phase_r >> 8]
+        green = sine[self.phase_g >> 8]
+        blue = sine[self.phase_b >> 8]
+
+        self.phase_r = (self.phase_r + self.step_r) & 0xffff
+        self.phase_g = (self.phase_g + self.step_g) & 0xffff
+        self.phase_b = (self.phase_b + self.step_b) & 0xffff
+
+        total = red + green + blue
+        return red * 255 // total, green * 255 // total, blue * 255 // total
+
+    def next_into(self, buf, pos=0):
+        """
+        Write the next colour as 3 RGB bytes into buf at pos, without
+        building a tuple.
+        """
+        sine = SINE
+        red = sine[self.phase_r >> 8]
+        green = sine[self.phase_g >> 8]
+        blue = sine[self.phase_b >> 8]
+
+        self.phase_r = (self.phase_r + self.step_r) & 0xffff
+        self.phase_g = (self.phase_g + self.step_g) & 0xffff
+        self.phase_b = (self.phase_b + self.step_b) & 0xffff
+
+        total = red + green + blue
+        buf[pos] = red * 255 // total
+        buf[pos+1] = green * 255 // total
+        buf[pos+2] = blue * 255 // total
+
+
+def color_gen(seq=0, freqs=(0.1, 0.1324, 0.1654), phases=(0, 0, 0)):
+    return ColorGen(freqs, phases, seq)
@@ -0,0 +1,146 @@
+"""
+Receive LED frames over UDP and show them on the WS2812 driver in neo2.py.
+
+Packets use the DDP (Distributed Display Protocol) header, so xLights, WLED
+tools or host/ddp_send.py can drive the strip:
+
+    byte 0      flags: 0x40 version 1, 0x10 timecode, 0x01 push
+    byte 1      sequence number in the low 4 bits (1-15, 0 = not used)
+    byte 2      data type (ignored, 8 bit RGB assumed)
+    byte 3      destination id (ignored)
+    bytes 4-7   byte offset of the data in the frame, big endian
+    bytes 8-9   data length, big endian
+    (bytes 10-13 timecode if the flag is set)
+    data        RGB bytes
+
+Data is copied into stripe.frame and shown with stripe.commit() when a packet
+with the push flag arrives, so a frame may be split over several packets.
+
+    import ddp
+    import neo2
+
+    stripe = neo2.WS2812(spi_bus=1, led_count=240, gc_every=0)
+    receiver = ddp.DDPReceiver(stripe)
+    receiver.run()
+"""
+
+import socket
+import utime as time
+
+PORT = 4048
+HEADER_SIZE = 10
+TIMECODE_SIZE = 4
+MAX_DATA = 1440  # largest data block DDP senders put in one packet
+
+FLAG_VERSION = 0x40
+FLAG_TIMECODE = 0x10
+FLAG_PUSH = 0x01
+
+
+class DDPReceiver:
+    def __init__(self, stripe, port=PORT):
+        self.stripe = stripe
+        self.frame = memoryview(stripe.frame)
+        self.frame_length = len(stripe.frame)
+
+        self.buf = bytearray(HEADER_SIZE + TIMECODE_SIZE + MAX_DATA)
+        self.mv = memoryview(self.buf)
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(socket.getaddrinfo('0.0.0.0', port)[0][-1])
+        self.recv_into = getattr(self.sock, 'recv_into', None) or self.sock.readinto
+
+        self.last_seq = 0
+        self.frame_start = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        self.packets = 0
+        self.frames = 0
+        self.lost = 0      # packets missing from the sequence numbers
+        self.stale = 0     # old or duplicate packets dropped
+        self.invalid = 0
+        self.latency_us = 0  # first packet of a frame to frame sent
+        self.max_latency_us = 0
+        self.total_latency_us = 0
+
+    def stats(self):
+        return {
+            'packets': self.packets,
+            'frames': self.frames,
+            'lost': self.lost,
+            'stale': self.stale,
+            'invalid': self.invalid,
+            'latency_us': self.latency_us,
+            'max_latency_us': self.max_latency_us,
+            'avg_latency_us': self.total_latency_us // self.frames if self.frames else 0,
+        }
+
+    def handle(self, size):
+        """
+        Process one packet of size bytes in self.buf.
+        """
+        buf = self.buf
+        flags = buf[0]
+        if size < HEADER_SIZE or flags & 0xc0 != FLAG_VERSION:
+            self.invalid += 1
+            return
+        self.packets += 1
+
+        seq = buf[1] & 0x0f
+        if seq and self.last_seq:
+            # sequence numbers count 1-15, then wrap to 1
+            step = (seq - self.last_seq) % 15
+            if step == 0 or step > 7:
+                self.stale += 1
+                return
+            self.lost += step - 1
+        self.last_seq = seq
+
+        if self.frame_start is None:
+            self.frame_start = time.ticks_us()
+
+        start = HEADER_SIZE + (TIMECODE_SIZE if flags & FLAG_TIMECODE else 0)
+        offset = buf[4] << 24 | buf[5] << 16 | buf[6] << 8 | buf[7]
+        length = buf[8] << 8 | buf[9]
+        length = min(length, size - start, self.frame_length - offset)
+        if length > 0:
+            self.frame[offset:offset + length] = self.mv[start:start + length]
+
+        if flags & FLAG_PUSH:
+            self.stripe.commit()
+            self.latency_us = time.ticks_diff(time.ticks_us(), self.frame_start)
+            self.frame_start = None
+            if self.latency_us > self.max_latency_us:
+                self.max_latency_us = self.latency_us
+            self.total_latency_us += self.latency_us
+            self.frames += 1
+
+    def poll(self):
+        """
+        Handle every packet waiting on the socket without blocking. Call this
+        from a loop that does other work too.
+        """
+        self.sock.setblocking(False)
+        while True:
+            try:
+                size = self.recv_into(self.buf)
+            except OSError:  # EAGAIN
+                return
+            if not size:
+                return
+            self.handle(size)
+
+    def run(self, idle_ms=100):
+        """
+        Receive and show frames forever. The stripe's idle() runs whenever
+        no packet arrived for idle_ms, so GC happens between streams.
+        """
+        self.sock.settimeout(idle_ms / 1000)
+        while True:
+            try:
+                size = self.recv_into(self.buf)
+            except OSError:  # timed out
+                self.stripe.idle()
+                continue
+            self.handle(size)
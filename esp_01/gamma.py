@@ -0,0 +1,127 @@
+"""
+Integer colour correction for LED output.
+
+Gamma and brightness are folded into one lookup table per channel, so the
+hot loops only index tables and never touch floats:
+
+    import gamma
+    correction = gamma.ColorCorrection(gamma=2.2, brightness=(255, 200, 180))
+    r_table, g_table, b_table = correction.tables()
+    green = g_table[green]
+
+Used by neo2.WS2812, neo1.CorrectedNeoPixel and rgb.RGB.
+"""
+
+from array import array
+
+
+class ColorCorrection:
+    # Order the dither thresholds are used in, so the extra steps are spread
+    # over the cycle instead of bunched together (bit reversed counting)
+    DITHER_ORDER = {
+        1: (0,),
+        2: (0, 1),
+        4: (0, 2, 1, 3),
+        8: (0, 4, 2, 6, 1, 5, 3, 7),
+    }
+
+    def __init__(self, gamma=2.2, brightness=255, out_max=255, dither=1):
+        """
+        Params:
+        * gamma = gamma exponent, one value or one for each of (R, G, B)
+        * brightness = 0-255, one value or one for each of (R, G, B)
+        * out_max = largest output value: 255 for WS2812/NeoPixel, 1023 for PWM duty
+        * dither = number of temporal dithering phases (1, 2, 4 or 8; 1 = off)
+        """
+        if dither not in self.DITHER_ORDER:
+            raise ValueError('dither must be one of 1, 2, 4, 8')
+
+        if not isinstance(gamma, (tuple, list)):
+            gamma = (gamma, gamma, gamma)
+        if not isinstance(brightness, (tuple, list)):
+            brightness = (brightness, brightness, brightness)
+
+        self.gamma = gamma
+        self.brightness = brightness
+        self.out_max = out_max
+        self.dither = dither
+        self.phase = 0
+
+        # phase_tables[phase] = (red table, green table, blue table)
+        self.phase_tables = []
+        for step in self.DITHER_ORDER[dither]:
+            threshold = (step + 0.5) / dither if dither > 1 else 0.5
+            self.phase_tables.append(tuple(
+                self.build_table(gamma[c], brightness[c], out_max, threshold)
+                for c in range(3)))
+
+    @staticmethod
+    def build_table(gamma, brightness, out_max, threshold=0.5):
+        """
+        Build the table for one channel. threshold is the rounding point, the
+        dither phases use different ones so they average to the exact value.
+        """
+        if out_max > 255:
+            table = array('H', [0] * 256)
+        else:
+            table = bytearray(256)
+
+        scale = brightness / 255 * out_max
+        for value in range(256):
+            level = int((value / 255) ** gamma * scale + threshold)
+            table[value] = min(level, out_max)
+        return table
+
+    def scaled(self, factor):
+        """
+        A copy with the brightness multiplied by factor, e.g. a driver's
+        overall intensity, so both are applied in one table.
+        """
+        return ColorCorrection(self.gamma, tuple(b * factor for b in self.brightness), self.out_max, self.dither)
+
+    def tables(self, phase=0):
+        """
+        Returns the (red, green, blue) tables for one dither phase.
+        """
+        return self.phase_tables[phase]
+
+    def next_phase(self):
+        """
+        Advance to the next dither phase and return its tables.
+        """
+        self.phase = (self.phase + 1) % self.dither
+        return self.phase_tables[self.phase]
+
+    def correct(self, red, green, blue):
+        """
+        Correct a single colour with the current phase. Returns a new tuple,
+        so keep it out of per-pixel loops.
+        """
+        red_table, green_table, blue_table = self.phase_tables[self.phase]
+        return red_table[red], green_table[green], blue_table[blue]
+
+    def correct_into(self, src, dst, order=(0, 1, 2, 3), bpp=3):
+        """
+        Correct a whole buffer of RGB(W) bytes into dst, reordering the
+        channels for the output: src byte i of a pixel goes to dst byte
+        order[i]. NeoPixel.ORDER can be passed as is. White is copied
+        unchanged.
+
+        With dithering each call moves on to the next phase, so call it once
+        per frame.
+        """
+        red_table, green_table, blue_table = self.next_phase()
+        red_at = order[0]
+        green_at = order[1]
+        blue_at = order[2]
+        white_at = order[3] if bpp == 4 else 0
+
+        pos = 0
+        length = len(src)
+        while pos < length:
+            dst[pos + red_at] = red_table[src[pos]]
+            dst[pos + green_at] = green_table[src[pos + 1]]
+            dst[pos + blue_at] = blue_table[src[pos + 2]]
+            if bpp == 4:
+                dst[pos + white_at] = src[pos + 3]
+            pos += bpp
@@ -0,0 +1,332 @@
+"""
+Shared HTTP server core: request reading, a route table and a buffered
+response writer.
+
+Handlers are looked up in a dict by (method, path) instead of an if/elif
+chain, and get the request (an httpreader.RequestReader) and a Response:
+
+    import httpcore
+
+    class Server(httpcore.HTTPServer):
+        def __init__(self):
+            super().__init__()
+            self.route(b"GET", b"/", self.index)
+
+        def index(self, request, response):
+            params = httpcore.parse_query(request.query)
+            response.send("200", "<h1>Hello</h1>")
+
+    Server().run()
+
+The Response collects the status line, headers and body in one preallocated
+buffer, so a response normally leaves in a single send. A file attached to
+the response (see staticfiles.py) is streamed after the headers through
+the same buffer.
+"""
+
+import socket
+import httpreader
+
+STATUS = {
+    "200": "OK",
+    "204": "No Content",
+    "304": "Not Modified",
+    "400": "Bad Request",
+    "404": "Not Found",
+    "413": "Payload Too Large",
+    "431": "Request Header Fields Too Large",
+    "500": "Internal Server Error",
+    "501": "Not Implemented",
+    "503": "Service Unavailable",
+    "505": "Version Not Supported",
+}
+
+
+def unquote(value):
+    """
+    Decode + and %XX escapes of a query string value.
+    """
+    if '%' not in value and '+' not in value:
+        return value
+    value = value.replace('+', ' ')
+    parts = value.split('%')
+    out = bytearray(parts[0].encode())
+    for part in parts[1:]:
+        try:
+            out.append(int(part[:2], 16))
+            out.extend(part[2:].encode())
+        except ValueError:
+            out.extend(b'%' + part.encode())
+    return out.decode()
+
+
+def parse_query(query):
+    """
+    Dict of the name=value pairs in query (str, bytes or memoryview).
+    """
+    if not isinstance(query, str):
+        query = str(query, 'utf-8')
+    params = {}
+    if query:
+        for param in query.split('&'):
+            (name, _, value) = param.partition('=')
+            params[unquote(name)] = unquote(value)
+    return params
+
+
+def etag_matches(request, etag):
+    """
+    True if the request's If-None-Match header is * or lists etag (quoted
+    str), i.e. the client's copy is current. Entity tags are compared whole,
+    ignoring a W/ (weak) prefix on either side.
+    """
+    value = request.header(b"if-none-match")
+    if value is None:
+        return False
+    etag = etag.encode()
+    if etag.startswith(b"W/"):
+        etag = etag[2:]
+    for tag in bytes(value).split(b","):
+        tag = tag.strip()
+        if tag == b"*":
+            return True
+        if tag.startswith(b"W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+def no_delay(sock):
+    """
+    Turn off Nagle's algorithm where the port supports it. A file streamed
+    in chunks ends with a short send that Nagle would otherwise hold back
+    until the client's delayed ACK, about 40 ms.
+    """
+    try:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    except (AttributeError, OSError):
+        pass
+
+
+class Response:
+    def __init__(self, size=1024):
+        """
+        Params:
+        * size = bytes buffered before they are sent
+        """
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        self.length = 0
+        self.out = None
+        self.keep_alive = False
+        self.file = None  # streamed after the buffered part by finish()
+        self.sends = 0
+
+    def begin(self, out, keep_alive=False):
+        """
+        Start a response that is sent with out(data), e.g. sock.sendall or
+        a stream writer's write.
+        """
+        self.out = out
+        self.keep_alive = keep_alive
+        self.length = 0
+        self.close_file()
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        size = len(data)
+        if self.length + size > len(self.buf):
+            self.flush()
+            if size > len(self.buf):
+                self.out(data)
+                self.sends += 1
+                return
+        self.mv[self.length:self.length + size] = data
+        self.length += size
+
+    def flush(self):
+        if self.length:
+            self.out(self.mv[:self.length])
+            self.sends += 1
+            self.length = 0
+
+    def fill(self, f):
+        """
+        Read from f into the free part of the buffer. Returns the number of
+        bytes read, 0 at the end of f.
+        """
+        n = f.readinto(self.mv[self.length:]) or 0
+        self.length += n
+        return n
+
+    def finish(self):
+        """
+        Send what is buffered, then the attached file in buffer sized chunks.
+        """
+        try:
+            if self.file is not None:
+                while self.fill(self.file):
+                    self.flush()
+        finally:
+            self.close_file()
+        self.flush()
+
+    async def finish_async(self, drain):
+        """
+        finish() for a stream writer: waits for drain() after every chunk,
+        so no more than one chunk is queued.
+        """
+        try:
+            if self.file is not None:
+                while self.fill(self.file):
+                    self.flush()
+                    await drain()
+        finally:
+            self.close_file()
+        self.flush()
+        await drain()
+
+    def close_file(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    def start(self, code, length, content_type='text/html', headers=None):
+        """
+        Write the status line and headers for a body of length bytes.
+        headers is a list of extra header lines without line ends.
+        """
+        self.write("HTTP/1.1 " + code + " " + STATUS.get(code, "") + "\r\n" +
+                   "Content-Type: " + content_type + "\r\n" +
+                   "Content-Length: " + str(length) + "\r\n")
+        if headers:
+            for header in headers:
+                self.write(header + "\r\n")
+        self.write("Connection: keep-alive\r\n\r\n" if self.keep_alive else "Connection: close\r\n\r\n")
+
+    def send(self, code, body, content_type='text/html', headers=None):
+        if isinstance(body, str):
+            body = body.encode()
+        self.start(code, len(body), content_type, headers)
+        self.write(body)
+
+    def no_content(self):
+        """
+        Write a 204 response, which has no body.
+        """
+        self.write("HTTP/1.1 204 No Content\r\n" +
+                   ("Connection: keep-alive\r\n\r\n" if self.keep_alive else "Connection: close\r\n\r\n"))
+
+    def not_modified(self, etag, cache_control='no-cache'):
+        """
+        Write a 304 response, which has no body.
+        """
+        self.write("HTTP/1.1 304 Not Modified\r\nETag: " + etag + "\r\n" +
+                   ("Cache-Control: " + cache_control + "\r\n" if cache_control else "") +
+                   ("Connection: keep-alive\r\n\r\n" if self.keep_alive else "Connection: close\r\n\r\n"))
+
+    def error(self, code):
+        self.send(code, "<h1>" + STATUS.get(code, code) + "</h1>")
+
+
+class HTTPServer:
+    MAX_REQUESTS = 20  # requests served on one connection before it is closed
+    IDLE_TIMEOUT = 1  # seconds to wait for the next request on an open connection
+    MAX_REQUEST_SIZE = 1024  # bytes of request line, headers and body; larger heads get 431
+    RESPONSE_SIZE = 1024  # bytes of response buffered before a send
+
+    def __init__(self):
+        self.routes = {}
+        self.methods = set()
+        self.default = None  # handler for GET requests no route matches
+        self.reader = httpreader.RequestReader(self.MAX_REQUEST_SIZE)
+        self.response = Response(self.RESPONSE_SIZE)
+
+    def route(self, method, path, handler):
+        """
+        Call handler(request, response) for requests of method (e.g. b"GET")
+        to path (e.g. b"/").
+        """
+        self.routes[(method, path)] = handler
+        self.methods.add(method)
+
+    def dispatch(self, request, response, out, keep_alive=False):
+        """
+        Answer the request into response, which sends with out(data). Call
+        response.finish() to send the rest. Returns True if the connection
+        stays open.
+        """
+        version = request.version
+        response.begin(out, keep_alive and request.keep_alive())
+        if version != b"HTTP/1.0" and version != b"HTTP/1.1":
+            response.keep_alive = False
+            response.error("505")
+        else:
+            method = bytes(request.method)
+            handler = self.routes.get((method, bytes(request.path)))
+            if handler is not None:
+                handler(request, response)
+            elif method == b"GET" and self.default is not None:
+                self.default(request, response)
+            elif method in self.methods:
+                response.error("404")
+            else:
+                response.error("501")
+        return response.keep_alive
+
+    def handle(self, conn, addr):
+        conn.settimeout(self.IDLE_TIMEOUT)
+        no_delay(conn)
+        reader = self.reader
+        reader.reset(addr)
+        served = 0
+        while served < self.MAX_REQUESTS:
+            try:
+                if not reader.read_request(conn):
+                    return
+            except httpreader.RequestError as e:
+                print("Request error {} - {}:{}".format(e.args[0], addr[0], addr[1]))
+                self.response.begin(conn.sendall)
+                self.response.error(e.args[0])
+                self.response.flush()
+                return
+            except OSError as e:
+                if e.args[0] == "timed out" or e.args[0] == 110:  # ETIMEDOUT
+                    if served == 0:
+                        print("Socket Timeout - {}:{}".format(addr[0], addr[1]))
+                else:
+                    print("OSError: {}".format(e))
+                return
+
+            served += 1
+            keep_alive = self.dispatch(reader, self.response, conn.sendall, served < self.MAX_REQUESTS)
+            self.response.finish()
+            if not keep_alive:
+                return
+            reader.next()
+
+    def run(self, port=80):
+        host = socket.getaddrinfo('0.0.0.0', port)[0][-1]
+        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server.bind(host)
+        server.listen(5)
+        print("Server started on {}".format(host))
+        while True:
+            conn, addr = server.accept()
+            try:
+                self.handle(conn, addr)
+            except Exception as e:
+                print(e)
+                try:
+                    self.response.begin(conn.sendall)
+                    self.response.error("500")
+                    self.response.flush()
+                except Exception:
+                    print("Error processing HTTP 500")
+            finally:
+                try:
+                    conn.close()
+                except Exception:
+                    print("Error closing socket")
@@ -0,0 +1,310 @@
+"""
+Bounded, zero-copy HTTP request reader.
+
+Requests are received with recv_into()/readinto() straight into one
+preallocated bytearray and parsed in place. The request line parts, header
+values and body are handed out as memoryview slices of that buffer, so
+reading a request allocates no copies of it, and a request whose headers
+don't fit is refused instead of growing without limit:
+
+    reader = httpreader.RequestReader(1024)
+    while reader.read_request(conn):
+        if reader.method == b"GET" and reader.path == b"/":
+            ...
+        reader.next()
+
+Requests sent back to back on the same connection (pipelining) stay in the
+buffer until next() moves on to them.
+"""
+
+
+class RequestError(Exception):
+    """
+    The request can't be read. args are (code, message) for the response.
+    """
+    pass
+
+
+def recv_into(sock, buf):
+    # CPython sockets have recv_into, MicroPython sockets readinto
+    recv = getattr(sock, 'recv_into', None)
+    if recv is None:
+        return sock.readinto(buf)
+    return recv(buf)
+
+
+async def stream_recv_into(stream, buf):
+    # uasyncio streams have readinto, asyncio streams only read
+    readinto = getattr(stream, 'readinto', None)
+    if readinto is not None:
+        return await readinto(buf)
+    data = await stream.read(len(buf))
+    buf[:len(data)] = data
+    return len(data)
+
+
+def lower(c):
+    return c + 32 if 65 <= c <= 90 else c
+
+
+class RequestReader:
+    MAX_HEADERS = 16
+
+    def __init__(self, size=1024):
+        """
+        Params:
+        * size = largest request head plus body accepted, in bytes
+        """
+        self.buf = bytearray(size)
+        self.mv = memoryview(self.buf)
+        # start, end of each header line's name and value
+        self.header_spans = [0] * (4 * self.MAX_HEADERS)
+        self.reset()
+
+    def reset(self, addr=None):
+        """
+        Forget everything received, e.g. for a new connection from addr.
+        """
+        self.addr = addr
+        self.start = 0       # first byte of the current request
+        self.end = 0         # end of the received data
+        self.scanned = 0     # bytes already searched for the end of the head
+        self.head_end = 0    # first byte after the blank line
+        self.body_end = 0
+        self.headers = 0
+        self.parsed = False
+
+    def read_request(self, sock):
+        """
+        Receive the next request, head and body. Returns False if the client
+        closed the connection before sending one. Raises RequestError with
+        431 if the head doesn't fit in the buffer or has more than
+        MAX_HEADERS headers, 413 if the body doesn't fit.
+        """
+        while True:
+            space = self.space()
+            if space is None:
+                return True
+            n = recv_into(sock, space)
+            if not n:
+                return False
+            self.end += n
+
+    async def read_request_async(self, stream):
+        """
+        read_request() for a uasyncio/asyncio stream.
+        """
+        while True:
+            space = self.space()
+            if space is None:
+                return True
+            n = await stream_recv_into(stream, space)
+            if not n:
+                return False
+            self.end += n
+
+    def space(self):
+        """
+        Where the next received bytes go (a memoryview), or None once the
+        current request is complete. Add the number of bytes received to
+        self.end.
+        """
+        if not self.parsed:
+            if not self.find_head_end():
+                if self.end == len(self.buf):
+                    if self.start == 0:
+                        raise RequestError("431", "Request Header Fields Too Large")
+                    self.compact()
+                return self.mv[self.end:]
+            self.parse_head()
+            length = self.content_length()
+            if self.head_end + length > len(self.buf) and self.start:
+                self.compact()
+                self.parse_head()
+            self.parsed = True
+            self.body_end = self.head_end + length
+            if self.body_end > len(self.buf):
+                raise RequestError("413", "Payload Too Large")
+        if self.end < self.body_end:
+            return self.mv[self.end:]
+        return None
+
+    def next(self):
+        """
+        Move on to the request after the current one.
+        """
+        self.start = self.body_end
+        self.scanned = self.start
+        self.headers = 0
+        self.parsed = False
+        if self.start == self.end:
+            self.start = self.end = self.scanned = 0
+
+    def compact(self):
+        # move a partly received request to the front of the buffer
+        buf = self.buf
+        start = self.start
+        length = self.end - start
+        for i in range(length):
+            buf[i] = buf[start + i]
+        self.start = 0
+        self.end = length
+        self.scanned -= start
+        self.head_end -= start
+
+    def find_head_end(self):
+        buf = self.buf
+        i = max(self.scanned, self.start + 3)
+        end = self.end
+        while i < end:
+            if buf[i] == 10 and buf[i - 1] == 13 and buf[i - 2] == 10 and buf[i - 3] == 13:
+                self.head_end = i + 1
+                return True
+            i += 1
+        self.scanned = end
+        return False
+
+    def parse_head(self):
+        buf = self.buf
+        start = self.start
+        head_end = self.head_end
+
+        # request line: METHOD SP URL SP VERSION CRLF
+        line_end = start
+        while buf[line_end] != 13:
+            line_end += 1
+        space1 = start
+        while space1 < line_end and buf[space1] != 32:
+            space1 += 1
+        space2 = line_end
+        while space2 > space1 and buf[space2] != 32:
+            space2 -= 1
+        if space2 <= space1:
+            raise RequestError("400", "Bad Request")
+
+        question = space1 + 1
+        while question < space2 and buf[question] != 63:
+            question += 1
+
+        self.method_span = (start, space1)
+        self.path_span = (space1 + 1, question)
+        self.query_span = (min(question + 1, space2), space2)
+        self.version_span = (space2 + 1, line_end)
+
+        # headers: NAME ":" VALUE CRLF, up to MAX_HEADERS
+        spans = self.header_spans
+        count = 0
+        pos = line_end + 2
+        while pos < head_end - 2 and count < self.MAX_HEADERS:
+            eol = pos
+            while buf[eol] != 13:
+                eol += 1
+            colon = pos
+            while colon < eol and buf[colon] != 58:
+                colon += 1
+            value = colon + 1
+            while value < eol and buf[value] == 32:
+                value += 1
+            at = count * 4
+            spans[at] = pos
+            spans[at + 1] = colon
+            spans[at + 2] = value
+            spans[at + 3] = eol
+            count += 1
+            pos = eol + 2
+        if pos < head_end - 2:
+            # more headers than we keep, one of them could be Content-Length
+            raise RequestError("431", "Request Header Fields Too Large")
+        self.headers = count
+
+    @property
+    def method(self):
+        return self.mv[self.method_span[0]:self.method_span[1]]
+
+    @property
+    def path(self):
+        return self.mv[self.path_span[0]:self.path_span[1]]
+
+    @property
+    def query(self):
+        return self.mv[self.query_span[0]:self.query_span[1]]
+
+    @property
+    def version(self):
+        return self.mv[self.version_span[0]:self.version_span[1]]
+
+    @property
+    def body(self):
+        return self.mv[self.head_end:self.body_end]
+
+    def find_header(self, name):
+        """
+        Index into header_spans of the header called name (lower case bytes),
+        or -1.
+        """
+        buf = self.buf
+        spans = self.header_spans
+        length = len(name)
+        for at in range(0, self.headers * 4, 4):
+            start = spans[at]
+            if spans[at + 1] - start != length:
+                continue
+            i = 0
+            while i < length and lower(buf[start + i]) == name[i]:
+                i += 1
+            if i == length:
+                return at
+        return -1
+
+    def header(self, name):
+        """
+        Value of the header called name (lower case bytes) as a memoryview,
+        or None.
+        """
+        at = self.find_header(name)
+        if at < 0:
+            return None
+        return self.mv[self.header_spans[at + 2]:self.header_spans[at + 3]]
+
+    def header_has(self, name, token):
+        """
+        True if the value of header name contains token (lower case bytes),
+        ignoring case.
+        """
+        at = self.find_header(name)
+        if at < 0:
+            return False
+        buf = self.buf
+        length = len(token)
+        start = self.header_spans[at + 2]
+        last = self.header_spans[at + 3] - length
+        while start <= last:
+            i = 0
+            while i < length and lower(buf[start + i]) == token[i]:
+                i += 1
+            if i == length:
+                return True
+            start += 1
+        return False
+
+    def content_length(self):
+        at = self.find_header(b"content-length")
+        if at < 0:
+            return 0
+        buf = self.buf
+        value = 0
+        for i in range(self.header_spans[at + 2], self.header_spans[at + 3]):
+            c = buf[i]
+            if not 48 <= c <= 57:
+                raise RequestError("400", "Bad Request")
+            value = value * 10 + c - 48
+        return value
+
+    def keep_alive(self):
+        """
+        True if the client wants the connection kept open, going by the HTTP
+        version and the Connection header.
+        """
+        if self.version == b"HTTP/1.1":
+            return not self.header_has(b"connection", b"close")
+        return self.header_has(b"connection", b"keep-alive")
@@ -1,6 +1,11 @@
 from umqtt.simple import MQTTClient
-from time import sleep
 import utils
+import mqtt_async
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
 
 from mqtt_config import config
 
@@ -14,35 +19,24 @@ client = MQTTClient(utils.get_mac(), MQTT_BROKER)
 
 def rcv(topic, msg):
     print("{}: {}".format(topic.decode("utf-8"), msg.decode("utf-8")))
-    client.publish(MQTT_PUB, '{"rcv":"'+msg.decode("utf-8")+'"}')
+    loop.publish(MQTT_PUB, '{"rcv":"'+msg.decode("utf-8")+'"}')
 
 
 client.set_callback(rcv)
 client.set_last_will('test/admin', 'OOPS - ' + utils.get_mac() + ' crashed!')
 client.connect()
 client.subscribe(MQTT_SUB)
+loop = mqtt_async.MQTTLoop(client)
 
 
 def start_loop():
     try:
-        while True:
-            client.check_msg()
-            sleep(1)
-    except KeyboardInterrupt:
-        pass
-    finally:
-        client.disconnect()
-
-
-def start_loop2():
-    try:
-        while True:
-            client.wait_msg()
+        asyncio.run(loop.run())
     except KeyboardInterrupt:
         pass
     finally:
         client.disconnect()
 
 
-start_loop2()
+start_loop()
 
@@ -1,4 +1,5 @@
 import time
+import struct
 import machine
 import network
 import ubinascii
@@ -6,6 +7,17 @@ import ssd1306
 import json
 from umqtt.simple import MQTTClient
 
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import mqtt_async
+import mqtt_session
+import mqtt_journal
+import mqtt_commands
+import telemetry
+
 from mqtt_config import config
 
 
@@ -15,6 +27,12 @@ class Announce:
     MQTT_APP = config['topic_app']
     MQTT_SYS = config['topic_sys']
 
+    # binary commands, on the subscribed topic + '/b': opcode byte, then arguments
+    OP_LED = 1  # 'B': 1 on, 0 off
+    OP_STATUS = 2  # no arguments, answered with STATUS_FORMAT on the system topic + '/b'
+    OP_TIME = 3  # '>HBBBBBBB': RTC.datetime() tuple
+    STATUS_FORMAT = '>B6sBHH'  # OP_STATUS, mac, led on, reconnects, dropped
+
     ESP_DEVICE = config['platform']
     
     if ESP_DEVICE == 'ESP01':
@@ -28,21 +46,33 @@ class Announce:
     
     def __init__(self):
         self.mac = self.get_mac()
+        self.mac_bytes = ubinascii.unhexlify(self.mac)
 
         self.mqtt_sub = ''.join([self.MQTT_SUB, '/', self.mac])
         self.mqtt_pub = ''.join([self.MQTT_SUB, '/', self.MQTT_APP])
         self.mqtt_pub_sys = ''.join([self.MQTT_SUB, '/', self.MQTT_SYS])
+        self.mqtt_sub_binary = self.mqtt_sub + '/b'
+        self.binary_topic = self.mqtt_sub_binary.encode()  # compared with the received topic as is
 
+        self.commands = self.init_commands()
         self.mqtt = self.init_mqtt()
+        # button events are QoS 1 and kept on flash until the broker has them
+        self.session = mqtt_session.Session(self.mqtt, [self.mqtt_sub, self.mqtt_sub_binary],
+                                            journal=mqtt_journal.Journal('outbox.bin'))
         self.display = self.init_oled()
         self.led = self.init_led()
 
         self.rtc = machine.RTC()
         self.init_rtc()
 
+        self.btn_flag = mqtt_async.new_flag()  # set by btn_pushed(), see button_loop()
+        self.btn_cmd = None
         self.btn = self.init_btn()
         self.prev_btn_press = time.ticks_ms()
 
+        self.wlan = network.WLAN(network.STA_IF)
+        self.telemetry = self.init_telemetry()
+
     def init_led(self):
         led = machine.Pin(self.PIN_LED, machine.Pin.OUT)
         led.on()
@@ -57,7 +87,21 @@ class Announce:
         pub_data = {}
         pub_data['mac'] = self.mac
         pub_data['cmd'] = 'RTC'
-        self.mqtt.publish(self.mqtt_pub_sys, json.dumps(pub_data))
+        self.session.publish(self.mqtt_pub_sys, json.dumps(pub_data))
+
+    def init_telemetry(self):
+        # one message a minute with what changed, all of it every 10 minutes
+        t = telemetry.Telemetry(self.session.publish, self.mqtt_pub_sys, {'mac': self.mac, 'cmd': 'TELEMETRY'})
+        t.add('mem', telemetry.free_heap, 1)
+        t.add('rssi', self.rssi, 3)
+        t.add('led', lambda: 0 if self.led.value() else 1)
+        return t
+
+    def rssi(self):
+        try:
+            return self.wlan.status('rssi')
+        except OSError:
+            return 0  # not connected
 
     def init_oled(self):
         oled_width = 128
@@ -83,13 +127,10 @@ class Announce:
         return oled
 
     def init_mqtt(self):
-        client = MQTTClient(self.mac, self.MQTT_BROKER)
+        client = MQTTClient(self.mac, self.MQTT_BROKER, keepalive=60)  # mqtt_async pings every 30 s
         client.set_callback(self.mqtt_process_sub)
         client.set_last_will(self.mqtt_pub_sys, '{{"mac":"{}","cmd":"STATUS","sys":"OFFLINE"}}'.format(self.mac))
-        time.sleep(0.1)
-        client.connect()
-        client.subscribe(self.mqtt_sub)
-        return client
+        return client  # connected and subscribed by the session
 
     @staticmethod
     def get_mac():
@@ -97,39 +138,63 @@ class Announce:
         mac = ubinascii.hexlify(network.WLAN().config('mac')).decode().upper()
         return mac
 
+    def init_commands(self):
+        commands = mqtt_commands.Commands()
+        commands.add_json('led', self.json_led)  # {"led":"ON"}
+        commands.add_json('cmd', self.json_cmd)  # {"cmd":"STATUS"}
+        commands.add_json('time', self.json_time)  # {"time":"2017:8:23:1:12:48:0:0"}
+        commands.add_binary(self.OP_LED, 'B', self.set_led)
+        commands.add_binary(self.OP_STATUS, '', self.status_binary)
+        commands.add_binary(self.OP_TIME, '>HBBBBBBB', self.set_time)
+        return commands
+
     def mqtt_process_sub(self, topic, msg):
-        channel = topic.decode("utf-8")
-        payload = msg.decode("utf-8")
-        print("{}: {}".format(channel, payload))
-
-        data = json.loads(payload)
-        if 'led' in data:  # {"led":"ON"}
-            self.update_display(['led', ' ' + data['led']])
-            if data['led'] == 'ON':
-                self.led.off()
-            elif data['led'] == 'OFF':
-                self.led.on()
-        elif 'cmd' in data:  # {"cmd":"STATUS"}
-            self.update_display(['cmd', ' ' + data['cmd']])
-            if data['cmd'] == 'STATUS':
-                pub_data = {}
-                pub_data['mac'] = self.mac
-                pub_data['cmd'] = 'STATUS'
-                # pub_data['time'] = ':'.join(map(str, self.rtc.datetime()))
-                if self.led.value():
-                    pub_data['led'] = 'OFF'
-                else:
-                    pub_data['led'] = 'ON'
-
-                self.mqtt.publish(self.mqtt_pub_sys, json.dumps(pub_data))
-        elif 'time' in data:  # {"time":"2017:8:23:1:12:48:0:0"}
-            self.update_display(['time', ' ' + data['time']])
-            # temp_time = tuple(int(x) for x in data['time'].split(':'))
-            temp_time = tuple(map(int, data['time'].split(':')))
-            time.sleep(0.1)
-            # print(temp_time)
-            # self.rtc.datetime((2017, 8, 23, 1, 12, 48, 0, 0))
-            self.rtc.datetime(temp_time)
+        if not self.commands.dispatch(msg, topic == self.binary_topic):
+            print("Unknown command on {}: {}".format(topic, msg))
+
+    def json_led(self, value):
+        if value == 'ON':
+            self.set_led(1)
+        elif value == 'OFF':
+            self.set_led(0)
+
+    def set_led(self, on):
+        self.update_display(['led', ' ON' if on else ' OFF'])
+        if on:
+            self.led.off()
+        else:
+            self.led.on()
+
+    def json_cmd(self, value):
+        self.update_display(['cmd', ' ' + value])
+        if value == 'STATUS':
+            pub_data = {}
+            pub_data['mac'] = self.mac
+            pub_data['cmd'] = 'STATUS'
+            # pub_data['time'] = ':'.join(map(str, self.rtc.datetime()))
+            if self.led.value():
+                pub_data['led'] = 'OFF'
+            else:
+                pub_data['led'] = 'ON'
+            stats = self.session.stats()
+            pub_data['reconnects'] = stats['reconnects']
+            pub_data['dropped'] = stats['dropped']
+
+            self.session.publish(self.mqtt_pub_sys, json.dumps(pub_data))
+
+    def status_binary(self):
+        self.update_display(['cmd', ' STATUS'])
+        stats = self.session.stats()
+        self.session.publish(self.mqtt_pub_sys + '/b', struct.pack(
+            self.STATUS_FORMAT, self.OP_STATUS, self.mac_bytes, 0 if self.led.value() else 1,
+            min(stats['reconnects'], 0xffff), min(stats['dropped'], 0xffff)))
+
+    def json_time(self, value):
+        self.set_time(*map(int, value.split(':')))
+
+    def set_time(self, *datetime):
+        self.update_display(['time', ' ' + ':'.join(map(str, datetime))])
+        self.rtc.datetime(datetime)
 
     def update_display(self, msg_list):
         line = 20
@@ -150,46 +215,55 @@ class Announce:
 
             if delta > 20:  # Ignore any triggers < 20ms
                 # self.led.value(not self.led.value())
-                pub_data = {}
-                pub_data['mac'] = self.mac
-                pub_data['time'] = ':'.join(map(str, self.rtc.datetime()))
-
                 if self.led.value():
-                    pub_data['cmd'] = 'HELP'
+                    self.btn_cmd = 'HELP'
                 else:
-                    pub_data['cmd'] = 'CANCEL'
+                    self.btn_cmd = 'CANCEL'
+                self.btn_flag.set()
+
+    async def button_loop(self):
+        # publishes for btn_pushed(): the journal and the outbox must not be
+        # changed from an IRQ handler, the loop may be in the middle of an ack
+        flag = self.btn_flag
+        while True:
+            await flag.wait()
+            if type(flag) is asyncio.Event:
+                flag.clear()
+            pub_data = {}
+            pub_data['mac'] = self.mac
+            pub_data['time'] = ':'.join(map(str, self.rtc.datetime()))
+            pub_data['cmd'] = self.btn_cmd
+            self.session.publish(self.mqtt_pub, json.dumps(pub_data), qos=1)
 
-                self.mqtt.publish(self.mqtt_pub, json.dumps(pub_data))
+    async def main(self):
+        asyncio.create_task(self.telemetry.run())
+        asyncio.create_task(self.button_loop())
+        await self.session.run()
 
     def start(self):
         print('Listening for {}...'.format(self.mqtt_sub))
         try:
-            while True:
-                self.mqtt.check_msg()
-                time.sleep(1)
+            asyncio.run(self.main())
         except KeyboardInterrupt:
             pass
         finally:
-            self.mqtt.disconnect()
+            self.session.disconnect()
 
 
 if __name__ == '__main__':
     announce = Announce()
     announce.start()
 
-# TODO: Timer pub on announce/system for heartbeat with mac & status payload
 # TODO: move to announce_esp
 # TODO: add security (user/pwd/cert?)
 # TODO: deepsleep mode
 # TODO: disable REPL in production mode
 # TODO: add LED effects:  all on/all flash fast/all flash slow/round robin sequence/alt corner sequence/corner flash 1 LED
 # TODO: round robin flash LEDs on loss of network
-# TODO: crashing on loss of network?
 # TODO: add exception handling and publish log message to system on error
 # TODO: flash LEDs on loss of broker connection
 # TODO: corner flash 1 LED if battery is low
 # TODO: Add buzzer?
-# TODO: mqqt keepalive setting?
 # TODO: add hardware reset button?
 # TODO: status call to ESP-01 currently turns off LED
 
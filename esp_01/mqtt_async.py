@@ -0,0 +1,363 @@
+"""
+asyncio loop for a connected umqtt.simple.MQTTClient.
+
+Instead of polling check_msg() every second, a reader task waits on the
+client's socket and handles each packet as soon as it arrives, calling the
+client's callback for PUBLISH. A keepalive task sends PINGREQ when nothing
+else was sent for ping_interval seconds and notices a broker that stopped
+answering. Other tasks run in between:
+
+    import uasyncio as asyncio
+    import mqtt_async
+
+    client.connect()
+    client.subscribe(topic)
+    loop = mqtt_async.MQTTLoop(client)
+    asyncio.run(loop.run())
+
+Publish with loop.publish(), not client.publish(): it only queues the
+message and wakes the writer task, so it may be called from callbacks and
+other tasks. Not from pin IRQ handlers, which can interrupt the loop while
+it changes the outbox or journal: set a flag (new_flag()) there and
+publish from a task waiting on it. The queue is an Outbox of fixed size that drops the
+oldest message when full, QoS 0 ones first, so messages published while
+the connection is down (see mqtt_session.py) take bounded memory.
+
+Messages published with qos=1 get a packet id and stay in flight until the
+broker's PUBACK. Up to window of them are in flight at once, so the loop
+doesn't wait a round trip per message; one without a PUBACK after
+retry_ms is sent again with the DUP flag, as are all of them after a
+reconnect. With a journal (mqtt_journal.py) they are also kept on flash
+until acked, so they survive a reboot.
+"""
+
+import sys
+import struct
+import utime as time
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+MICROPYTHON = sys.implementation.name == 'micropython'
+
+PUBLISH = 0x30
+PUBACK = 0x40
+SUBSCRIBE = 0x82
+SUBACK = 0x90
+PINGREQ = b"\xc0\x00"
+PINGRESP = 0xd0
+
+
+def encode_length(n):
+    """
+    MQTT remaining length (1-4 bytes, 7 bits each).
+    """
+    out = bytearray()
+    while True:
+        byte = n & 0x7f
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return out
+
+
+def subscribe_packet(topic, pid, qos=0):
+    if isinstance(topic, str):
+        topic = topic.encode()
+    packet = bytearray([SUBSCRIBE])
+    packet += encode_length(2 + 2 + len(topic) + 1)
+    packet += struct.pack('!HH', pid, len(topic))
+    packet += topic
+    packet.append(qos)
+    return packet
+
+
+def publish_packet(topic, msg, retain=False, qos=0, pid=0):
+    if isinstance(topic, str):
+        topic = topic.encode()
+    if isinstance(msg, str):
+        msg = msg.encode()
+    size = 2 + len(topic) + len(msg) + (2 if qos else 0)
+    packet = bytearray([PUBLISH | qos << 1 | retain])
+    packet += encode_length(size)
+    packet += struct.pack('!H', len(topic))
+    packet += topic
+    if qos:
+        packet += struct.pack('!H', pid)
+    packet += msg
+    return packet
+
+
+async def open_stream(sock):
+    """
+    (reader, writer) streams over an already connected socket.
+    """
+    if MICROPYTHON:
+        sock.setblocking(False)
+        stream = asyncio.StreamReader(sock)
+        return (stream, stream)
+    return await asyncio.open_connection(sock=sock)
+
+
+async def sleep_ms(ms):
+    if MICROPYTHON:
+        await asyncio.sleep_ms(ms)
+    else:
+        await asyncio.sleep(ms / 1000)
+
+
+class Outbox:
+    """
+    Ring buffer of (topic, msg, retain, qos, seq), oldest first.
+    """
+    def __init__(self, size=16):
+        self.slots = [None] * size
+        self.head = 0
+        self.count = 0
+        self.dropped = 0  # messages dropped because it was full
+
+    def __len__(self):
+        return self.count
+
+    def push(self, item):
+        """
+        Add item. When full, the oldest QoS 0 message makes room, or the
+        oldest of all if every one is QoS 1. Returns the dropped one, else
+        None.
+        """
+        slots = self.slots
+        size = len(slots)
+        dropped = None
+        if self.count == size:
+            head = self.head
+            victim = 0
+            while victim < size and slots[(head + victim) % size][3]:
+                victim += 1
+            if victim == size:
+                victim = 0
+            dropped = slots[(head + victim) % size]
+            # close the gap: the older ones move up by one
+            for i in range(victim, 0, -1):
+                slots[(head + i) % size] = slots[(head + i - 1) % size]
+            slots[head] = None
+            self.head = (head + 1) % size
+            self.count -= 1
+            self.dropped += 1
+        slots[(self.head + self.count) % size] = item
+        self.count += 1
+        return dropped
+
+    def peek(self):
+        return self.slots[self.head]
+
+    def pop(self):
+        item = self.slots[self.head]
+        self.slots[self.head] = None
+        self.head = (self.head + 1) % len(self.slots)
+        self.count -= 1
+        return item
+
+
+def new_flag():
+    # ThreadSafeFlag may be set from an IRQ handler and clears itself on
+    # wait(); CPython and older uasyncio only have Event
+    flag = getattr(asyncio, 'ThreadSafeFlag', None)
+    return flag() if flag is not None else asyncio.Event()
+
+
+class MQTTLoop:
+    def __init__(self, client, ping_interval=None, outbox_size=16, window=4, retry_ms=5000, journal=None):
+        """
+        Params:
+        * client = connected (and subscribed) umqtt.simple.MQTTClient
+        * ping_interval = seconds without sending before a PINGREQ;
+          default half the client's keepalive, or 30 s without one
+        * outbox_size = messages queued before the oldest are dropped
+        * window = QoS 1 messages in flight (sent, no PUBACK yet) at once
+        * retry_ms = resend a QoS 1 message without a PUBACK after this
+        * journal = mqtt_journal.Journal keeping QoS 1 messages on flash
+        """
+        self.client = client
+        if ping_interval is None:
+            ping_interval = client.keepalive // 2 if client.keepalive else 30
+        self.ping_interval = ping_interval
+        self.outbox = Outbox(outbox_size)  # waiting for the writer task
+        self.window = window
+        self.retry_ms = retry_ms
+        self.inflight = []  # [pid, journal seq, packet, ticks_ms sent] per QoS 1 message
+        self.pid = 0
+        self.journal = journal
+        self.wake = new_flag()
+        self.reader = None
+        self.writer = None
+        self.task = None  # the task in run(), cancelled on a keepalive timeout
+        self.timed_out = False
+        self.last_sent = time.ticks_ms()
+        self.ping_sent = None  # ticks_ms of the unanswered PINGREQ
+        self.messages = 0
+        self.pings = 0
+        self.ping_ms = 0  # round trip of the last PINGREQ
+        self.acked = 0
+        self.retransmits = 0
+        if journal is not None:
+            for (seq, topic, msg, retain) in journal.load():
+                self.queue((topic, msg, retain, 1, seq))
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        """
+        Queue a message for the writer task. qos is 0 or 1.
+        """
+        seq = None
+        if qos and self.journal is not None:
+            seq = self.journal.append(topic, msg, retain)
+        self.queue((topic, msg, retain, 1 if qos else 0, seq))
+        self.wake.set()
+
+    def queue(self, item):
+        dropped = self.outbox.push(item)
+        if dropped is not None and dropped[4] is not None:
+            self.journal.ack(dropped[4])  # given up on, don't replay it
+
+    async def run(self, topics=()):
+        """
+        Handle the connection until it fails. Raises OSError then. Messages
+        still in the outbox stay there for the next run().
+
+        Params:
+        * topics = topics to subscribe to first; the SUBACKs aren't waited for
+        """
+        (self.reader, self.writer) = await open_stream(self.client.sock)
+        self.task = asyncio.current_task()
+        self.timed_out = False
+        self.ping_sent = None
+        self.last_sent = time.ticks_ms()
+        for topic in topics:
+            self.pid = self.pid % 0xffff + 1
+            self.send(subscribe_packet(topic, self.pid))
+        for entry in self.inflight:
+            self.resend(entry)  # the broker may not have got them
+        if self.outbox:
+            self.wake.set()
+        tasks = [asyncio.create_task(self.write_loop()), asyncio.create_task(self.keepalive_loop()),
+                 asyncio.create_task(self.retry_loop())]
+        try:
+            await self.read_loop()
+        except EOFError:
+            raise OSError("connection closed")
+        except asyncio.CancelledError:
+            if not self.timed_out:
+                raise
+            raise OSError("keepalive timeout")
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def read_loop(self):
+        reader = self.reader
+        while True:
+            header = await reader.readexactly(1)
+            length = 0
+            shift = 0
+            while True:
+                byte = (await reader.readexactly(1))[0]
+                length |= (byte & 0x7f) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+            body = await reader.readexactly(length) if length else b""
+            self.handle(header[0], body)
+
+    def handle(self, kind, body):
+        if kind & 0xf0 == PUBLISH:
+            qos = (kind >> 1) & 3
+            topic_len = body[0] << 8 | body[1]
+            topic = body[2:2 + topic_len]
+            start = 2 + topic_len
+            if qos:
+                pid = body[start] << 8 | body[start + 1]
+                start += 2
+                self.send(struct.pack('!BBH', PUBACK, 2, pid))
+            self.messages += 1
+            self.client.cb(topic, body[start:])
+        elif kind == PUBACK:
+            pid = body[0] << 8 | body[1]
+            inflight = self.inflight
+            for i in range(len(inflight)):
+                if inflight[i][0] == pid:
+                    seq = inflight[i][1]
+                    del inflight[i]
+                    if seq is not None:
+                        self.journal.ack(seq)
+                    self.acked += 1
+                    self.wake.set()  # room in the window
+                    break
+        elif kind == PINGRESP:
+            if self.ping_sent is not None:
+                self.ping_ms = time.ticks_diff(time.ticks_ms(), self.ping_sent)
+                self.ping_sent = None
+
+    def send(self, packet):
+        self.writer.write(packet)
+        self.last_sent = time.ticks_ms()
+        self.wake.set()
+
+    async def write_loop(self):
+        while True:
+            await self.wake.wait()
+            if type(self.wake) is asyncio.Event:
+                self.wake.clear()
+            outbox = self.outbox
+            inflight = self.inflight
+            # in order: a QoS 1 message waiting for room in the window holds back the rest
+            while outbox and (not outbox.peek()[3] or len(inflight) < self.window):
+                (topic, msg, retain, qos, seq) = outbox.pop()
+                if qos:
+                    self.pid = self.pid % 0xffff + 1
+                    packet = publish_packet(topic, msg, retain, 1, self.pid)
+                    inflight.append([self.pid, seq, packet, time.ticks_ms()])
+                else:
+                    packet = publish_packet(topic, msg, retain)
+                self.writer.write(packet)
+                self.last_sent = time.ticks_ms()
+            await self.writer.drain()
+
+    def resend(self, entry):
+        packet = entry[2]
+        packet[0] |= 0x08  # DUP
+        entry[3] = time.ticks_ms()
+        self.retransmits += 1
+        self.send(packet)
+
+    async def retry_loop(self):
+        while True:
+            await sleep_ms(self.retry_ms // 4)
+            now = time.ticks_ms()
+            for entry in self.inflight:
+                if time.ticks_diff(now, entry[3]) >= self.retry_ms:
+                    self.resend(entry)
+
+    async def keepalive_loop(self):
+        interval = self.ping_interval * 1000
+        while True:
+            now = time.ticks_ms()
+            wait = interval - time.ticks_diff(now, self.last_sent)
+            if self.ping_sent is not None:
+                # checked first: packets sent since the PINGREQ don't make
+                # up for a missing PINGRESP
+                waited = time.ticks_diff(now, self.ping_sent)
+                if waited >= interval:
+                    # no PINGRESP for a whole interval: the broker or network is gone
+                    self.timed_out = True
+                    self.task.cancel()
+                    return
+                wait = min(wait, interval - waited)
+            if wait > 0:
+                await sleep_ms(wait)
+                continue
+            self.ping_sent = time.ticks_ms()
+            self.pings += 1
+            self.send(PINGREQ)
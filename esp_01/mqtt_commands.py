@@ -0,0 +1,84 @@
+"""
+Table-driven dispatch of MQTT commands, as JSON or in a compact binary form.
+
+JSON commands are objects whose key names the command, e.g. {"led":"ON"};
+the handler registered for the key gets the value. Binary commands are an
+opcode byte followed by the arguments packed with the struct format
+registered for the opcode; the handler gets the unpacked arguments. Which
+form a message is in is decided by its topic (Announce uses the topic
+with /b on the end for binary):
+
+    commands = mqtt_commands.Commands()
+    commands.add_json('led', led_json)
+    commands.add_binary(1, 'B', led_on)
+    ...
+    def callback(topic, msg):
+        commands.dispatch(msg, topic == binary_topic)
+
+A handler that raises is counted in errors and the message treated as
+not handled, so a bad value can't take down the MQTT loop calling back.
+
+Binary commands skip JSON parsing and the strings and dict it makes;
+msg is never decoded to str in either form.
+"""
+
+import struct
+
+try:
+    import json
+except ImportError:
+    import ujson as json
+
+
+class Commands:
+    def __init__(self):
+        self.json = {}  # key: handler(value)
+        self.binary = {}  # opcode: (format, size, handler(*args))
+        self.unknown = 0
+        self.errors = 0  # handlers that raised
+
+    def add_json(self, key, handler):
+        self.json[key] = handler
+
+    def add_binary(self, opcode, fmt, handler):
+        """
+        Params:
+        * opcode = first byte of the message, 0-255
+        * fmt = struct format of the arguments after it, '' for none
+        * handler = called with the unpacked arguments
+        """
+        self.binary[opcode] = (fmt, struct.calcsize(fmt), handler)
+
+    def dispatch(self, msg, binary=False):
+        """
+        Run the command in msg (bytes). Returns False if it isn't a known,
+        well-formed command or its handler raised.
+        """
+        if binary:
+            entry = self.binary.get(msg[0]) if msg else None
+            if entry is None or len(msg) != 1 + entry[1]:
+                self.unknown += 1
+                return False
+            return self.call(entry[2], struct.unpack_from(entry[0], msg, 1))
+
+        try:
+            data = json.loads(msg)
+        except ValueError:
+            self.unknown += 1
+            return False
+        if isinstance(data, dict):
+            for key in data:
+                handler = self.json.get(key)
+                if handler is not None:
+                    return self.call(handler, (data[key],))
+        self.unknown += 1
+        return False
+
+    def call(self, handler, args):
+        try:
+            handler(*args)
+        except Exception as e:
+            self.errors += 1
+            print('Command failed: {!r}'.format(e))
+            return False
+        return True
@@ -0,0 +1,124 @@
+"""
+Append-only file on flash for QoS 1 messages not yet acknowledged by the
+broker, so they survive a reboot. Used by mqtt_async.MQTTLoop:
+
+    journal = mqtt_journal.Journal('outbox.bin')
+    loop = mqtt_async.MQTTLoop(client, journal=journal)
+
+Each QoS 1 publish appends a record with the message and each PUBACK a
+short ack record; nothing is rewritten in place. When the loop is created,
+load() reads the file back, queues the messages without an ack again and
+compacts the file down to them. After that it is emptied whenever
+everything in it has been acked and it has grown past MAX_SIZE.
+
+Every record is a flash write, so this is meant for rare events (button
+presses), not telemetry.
+"""
+
+import struct
+
+HEADER = '<BBHBH'  # kind, retain, seq, topic length, message length
+HEADER_SIZE = 7
+PUBLISH = 1
+ACK = 2
+
+
+class Journal:
+    MAX_SIZE = 4096
+
+    def __init__(self, path='outbox.bin'):
+        """
+        Params:
+        * path = file on flash
+        """
+        self.path = path
+        self.f = None
+        self.seq = 0
+        self.pending = set()  # seqs of published records without an ack
+        self.size = 0
+
+    def load(self):
+        """
+        Read the file and return the unacknowledged messages, oldest first,
+        as (seq, topic, msg, retain). Rewrites the file with only those.
+        """
+        messages = []
+        try:
+            with open(self.path, 'rb') as f:
+                header = bytearray(HEADER_SIZE)
+                while f.readinto(header) == HEADER_SIZE:
+                    (kind, retain, seq, topic_len, msg_len) = struct.unpack(HEADER, header)
+                    if kind == PUBLISH:
+                        topic = f.read(topic_len)
+                        msg = f.read(msg_len)
+                        if len(topic) < topic_len or len(msg) < msg_len:
+                            break  # cut short by a reset while writing
+                        messages.append((seq, topic, msg, retain))
+                    elif kind == ACK:
+                        for i in range(len(messages)):
+                            if messages[i][0] == seq:
+                                del messages[i]
+                                break
+                    else:
+                        break
+        except OSError:
+            pass
+
+        self.close()
+        self.f = open(self.path, 'wb')
+        self.size = 0
+        self.pending = set()
+        self.seq = 0
+        for (seq, topic, msg, retain) in messages:
+            self.write(PUBLISH, retain, seq, topic, msg)
+            self.pending.add(seq)
+            self.seq = seq
+        self.f.flush()
+        return messages
+
+    def write(self, kind, retain, seq, topic=b"", msg=b""):
+        self.f.write(struct.pack(HEADER, kind, retain, seq, len(topic), len(msg)))
+        if kind == PUBLISH:
+            self.f.write(topic)
+            self.f.write(msg)
+        self.size += HEADER_SIZE + len(topic) + len(msg)
+
+    def append(self, topic, msg, retain=False):
+        """
+        Record a message. Returns its seq for ack(). Raises ValueError for a
+        topic longer than 255 bytes, the record has one byte for its length.
+        """
+        if isinstance(topic, str):
+            topic = topic.encode()
+        if len(topic) > 255:
+            raise ValueError("topic too long for the journal")
+        if self.f is None:
+            self.load()
+        if isinstance(msg, str):
+            msg = msg.encode()
+        self.seq = (self.seq + 1) & 0xffff
+        self.write(PUBLISH, 1 if retain else 0, self.seq, topic, msg)
+        self.f.flush()
+        self.pending.add(self.seq)
+        return self.seq
+
+    def ack(self, seq):
+        """
+        Record that the message with seq was delivered (or given up on).
+        """
+        if self.f is None or seq not in self.pending:
+            return
+        self.pending.remove(seq)
+        if not self.pending and self.size > self.MAX_SIZE:
+            self.f.close()
+            self.f = open(self.path, 'wb')
+            self.size = 0
+            return
+        self.write(ACK, 0, seq)
+        self.f.flush()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
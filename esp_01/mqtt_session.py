@@ -0,0 +1,145 @@
+"""
+MQTT session that survives broker and Wi-Fi outages, on top of
+umqtt.simple.MQTTClient and the asyncio loop in mqtt_async.py.
+
+run() connects, subscribes to the session's topics and runs the loop. When
+the connection fails (or can't be made) it waits and connects again, with
+exponential backoff from MIN_BACKOFF to MAX_BACKOFF ms and jitter, so a
+room full of devices doesn't reconnect to a restarted broker all at once.
+Topics are subscribed again on every connect.
+
+Connecting still blocks the other tasks, it is umqtt.simple's: the DNS
+lookup, then TCP and CONNECT/CONNACK, which are bounded by CONNECT_TIMEOUT
+(umqtt.simple 1.4 and later). The subscriptions are sent by the loop,
+without waiting for the SUBACKs.
+
+    client = MQTTClient(client_id, broker, keepalive=60)
+    client.set_callback(callback)
+    session = mqtt_session.Session(client, [topic])
+    session.publish(topic, msg)  # queued until connected
+    asyncio.run(session.run())
+
+Messages published while offline wait in the loop's fixed-size outbox and
+are sent in order after the next connect; when more than outbox_size pile
+up, the oldest are dropped, QoS 0 ones first (counted in stats()). QoS 1
+messages still in flight when the connection drops are sent again after
+the connect.
+"""
+
+import random
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import mqtt_async
+
+
+def jitter(ms):
+    # between half and all of ms
+    return ms // 2 + (random.getrandbits(16) * (ms - ms // 2) >> 16)
+
+
+class Session:
+    MIN_BACKOFF = 1000
+    MAX_BACKOFF = 60000
+    CONNECT_TIMEOUT = 5  # seconds, for each socket operation of connect()
+
+    def __init__(self, client, topics, outbox_size=16, ping_interval=None, window=4, journal=None):
+        """
+        Params:
+        * client = umqtt.simple.MQTTClient with its callback (and last
+          will) set, not connected
+        * topics = topics to subscribe to on every connect
+        * outbox_size = messages kept while offline
+        * ping_interval, window, journal = see mqtt_async.MQTTLoop
+        """
+        self.client = client
+        self.topics = topics
+        self.loop = mqtt_async.MQTTLoop(client, ping_interval, outbox_size, window, journal=journal)
+        self.connected = False
+        self.connects = 0
+        self.reconnects = 0  # connects after a lost connection
+        self.failures = 0  # connect attempts that failed
+        self.connect_timeout = True  # False once umqtt.simple turns out to have no timeout
+
+    def publish(self, topic, msg, retain=False, qos=0):
+        """
+        Queue a message, sent now or after the next connect.
+        """
+        self.loop.publish(topic, msg, retain, qos)
+
+    def connect(self):
+        # blocking, like the rest of umqtt.simple: DNS, TCP and CONNECT/CONNACK
+        client = self.client
+        if self.connect_timeout:
+            client.sock = None
+            try:
+                client.connect(timeout=self.CONNECT_TIMEOUT)
+                return
+            except TypeError:
+                if client.sock is not None:
+                    raise  # from inside connect(), not the call
+                # umqtt.simple before 1.4 has no timeout
+                self.connect_timeout = False
+        client.connect()
+
+    def close(self):
+        try:
+            self.client.sock.close()
+        except (AttributeError, OSError):
+            pass
+
+    async def run(self):
+        """
+        Stay connected until cancelled.
+        """
+        backoff = self.MIN_BACKOFF
+        while True:
+            try:
+                self.connect()
+            except Exception as e:
+                # OSError, or from umqtt.simple MQTTException for a refused
+                # CONNACK and IndexError/AssertionError for a closed socket
+                self.failures += 1
+                self.close()
+                print('MQTT connect failed: {}, retry in {} ms'.format(e, backoff))
+                await mqtt_async.sleep_ms(jitter(backoff))
+                backoff = min(backoff * 2, self.MAX_BACKOFF)
+                continue
+
+            if self.connects:
+                self.reconnects += 1
+            self.connects += 1
+            self.connected = True
+            backoff = self.MIN_BACKOFF
+            try:
+                await self.loop.run(self.topics)
+            except OSError as e:
+                print('MQTT connection lost: {}'.format(e))
+            finally:
+                self.connected = False
+                self.close()
+            await mqtt_async.sleep_ms(jitter(self.MIN_BACKOFF))
+
+    def disconnect(self):
+        if self.connected:
+            try:
+                self.client.disconnect()
+            except OSError:
+                pass
+            self.connected = False
+
+    def stats(self):
+        loop = self.loop
+        outbox = loop.outbox
+        return {
+            'connected': self.connected,
+            'reconnects': self.reconnects,
+            'failures': self.failures,
+            'queued': len(outbox),
+            'dropped': outbox.dropped,
+            'inflight': len(loop.inflight),
+            'retransmits': loop.retransmits,
+        }
@@ -2,51 +2,88 @@ import machine
 import neopixel
 import utime as time
 
+import gamma
+import pixbuf
+
 
 PIN_DATA = 14
 
+
+class CorrectedNeoPixel(neopixel.NeoPixel):
+    """
+    NeoPixel that keeps the colours as set in self.pixels (RGB order) and runs
+    them through a gamma.ColorCorrection into the output buffer on write().
+    """
+    def __init__(self, pin, n, correction, bpp=3):
+        super().__init__(pin, n, bpp)
+        self.correction = correction
+        self.pixels = bytearray(n * bpp)
+
+    def __setitem__(self, index, val):
+        offset = index * self.bpp
+        for i in range(self.bpp):
+            self.pixels[offset + i] = val[i]
+
+    def __getitem__(self, index):
+        offset = index * self.bpp
+        return tuple(self.pixels[offset + i] for i in range(self.bpp))
+
+    def fill(self, color):
+        # NeoPixel.fill() writes self.buf, which write() regenerates from self.pixels
+        pixels = self.pixels
+        bpp = self.bpp
+        for offset in range(0, len(pixels), bpp):
+            for i in range(bpp):
+                pixels[offset + i] = color[i]
+
+    def write(self):
+        self.correction.correct_into(self.pixels, self.buf, self.ORDER, self.bpp)
+        super().write()
+
+
 def demo(np):
     n = np.n
+    pb = pixbuf.PixelBuffer(np)
 
     # cycle
+    pb.fill((0, 0, 0))
+    pb.set(0, (255, 255, 255))
     for i in range(4 * n):
-        for j in range(n):
-            np[j] = (0, 0, 0)
-        np[i % n] = (255, 255, 255)
         np.write()
         time.sleep_ms(25)
+        pb.rotate(1)
 
     # bounce
     for i in range(4 * n):
-        for j in range(n):
-            np[j] = (0, 0, 128)
+        pb.fill((0, 0, 128))
         if (i // n) % 2 == 0:
-            np[i % n] = (0, 0, 0)
+            pb.set(i % n, (0, 0, 0))
         else:
-            np[n - 1 - (i % n)] = (0, 0, 0)
+            pb.set(n - 1 - (i % n), (0, 0, 0))
         np.write()
         time.sleep_ms(60)
 
     # fade in/out
     for i in range(0, 4 * 256, 8):
-        for j in range(n):
-            if (i // 256) % 2 == 0:
-                val = i & 0xff
-            else:
-                val = 255 - (i & 0xff)
-            np[j] = (val, 0, 0)
+        if (i // 256) % 2 == 0:
+            val = i & 0xff
+        else:
+            val = 255 - (i & 0xff)
+        pb.fill((val, 0, 0))
         np.write()
 
     # clear
-    for i in range(n):
-        np[i] = (0, 0, 0)
+    pb.fill((0, 0, 0))
     np.write()
 
 
-def run_demo(n):
-    np = neopixel.NeoPixel(machine.Pin(PIN_DATA), n)
+def run_demo(n, correction=None):
+    if correction is None:
+        np = neopixel.NeoPixel(machine.Pin(PIN_DATA), n)
+    else:
+        np = CorrectedNeoPixel(machine.Pin(PIN_DATA), n, correction)
     demo(np)
 
 
 if __name__ == '__main__':
-    run_demo(8)
+    run_demo(8, gamma.ColorCorrection(gamma=2.2, dither=4))
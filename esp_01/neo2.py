@@ -10,6 +10,10 @@ import utime as time
 import math
 import gc
 
+import animator
+import animfile
+import colorgen
+
 # from ws2812 import WS2812
 
 
@@ -29,45 +33,369 @@ class WS2812:
         ]
         chain.show(data)
 
+    Single LEDs may also be changed in place and sent with flush(). Only the
+    LEDs whose colour changed are re-encoded:
+
+        chain.set_pixel(2, (255, 255, 0))
+        chain.flush()
+
+    For animations that must not allocate, draw into the preallocated back
+    buffer chain.frame (3 bytes RGB per LED), or a bytearray of the same
+    size of your own, and call commit(). GC then runs every gc_every frames,
+    or only when idle() is called if gc_every is 0. Only the RGB frames are
+    double buffered: the SPI buffer is single, commit() encodes into it and
+    then sends it, so drawing the next frame can't tear the one on the wire
+    but encoding and sending don't overlap.
+
+    A gamma.ColorCorrection may be passed as correction to apply gamma and
+    per channel brightness. intensity is folded into its brightness, so each
+    value is quantized once, in the output range where dithering works. If
+    it dithers, call dither() once per frame.
+
     Version: 1.0
     """
     buf_bytes = (0x11, 0x13, 0x31, 0x33)
 
-    def __init__(self, spi_bus=1, led_count=1, intensity=1.0):
+    def __init__(self, spi_bus=1, led_count=1, intensity=1.0, gc_every=1, correction=None):
         """
         Params:
         * spi_bus = SPI bus ID (1 or 2)
         * led_count = count of LEDs
         * intensity = light intensity (float up to 1)
+        * gc_every = run gc.collect() after every N frames sent (0 = only in idle())
+        * correction = gamma.ColorCorrection with out_max 255, intensity is applied through it (optional)
         """
         self.led_count = led_count
-        self.intensity = intensity
+        self.gc_every = gc_every
+        self.correction = correction
+        self.intensity = intensity  # also builds the encoding table
 
         # prepare SPI data buffer (4 bytes for each color)
         self.buf_length = self.led_count * 3 * 4
         self.buf = bytearray(self.buf_length)
 
+        # last encoded frame as RGB, used to skip LEDs that didn't change
+        self.pixels = bytearray(self.led_count * 3)
+        self.lit = 0  # LEDs from here to the end are known to be off
+        self.dirty = False
+
+        # back buffer for commit(), same layout as pixels
+        self.frame = bytearray(self.led_count * 3)
+
+        # frame statistics
+        self.frames = 0
+        self.frame_us = 0
+        self.max_frame_us = 0
+        self.frame_alloc = 0  # bytes allocated while encoding the last commit()
+
         # SPI init
         self.spi = machine.SPI(spi_bus, machine.SPI.MASTER, baudrate=3200000, polarity=0, phase=1)
 
         # turn LEDs off
-        self.show([])
+        self.fill_buf([])
+        self.send_buf()
+
+    @property
+    def intensity(self):
+        return self._intensity
+
+    @intensity.setter
+    def intensity(self, value):
+        self._intensity = value
+        self.build_tables()
+        if hasattr(self, 'pixels'):
+            self.redraw()
+
+    def set_correction(self, correction):
+        """
+        Replace the colour correction (None to remove it) and re-encode.
+        """
+        self.correction = correction
+        self.build_tables()
+        self.redraw()
+
+    def build_tables(self):
+        """
+        Build the encoding tables for the current intensity and correction.
+
+        Every channel value is looked up in two steps: the table for its
+        channel in ctables gives the output level, lut maps that to its SPI
+        pattern (lut_bytes is the same, flat, for the byte by byte copies in
+        encode_frame(), as slicing allocates a slice object on MicroPython).
+
+        Without a correction, ctables are the identity and intensity is in
+        lut. With one, intensity goes into a copy of the correction (active)
+        and lut is unscaled, so there is only one rounding step.
+        """
+        if self.correction is None:
+            self.active = None
+            self.lut = self.build_lut(self._intensity)
+            identity = bytes(range(256))
+            self.ctables = (identity, identity, identity)
+        else:
+            self.active = self.correction.scaled(self._intensity)
+            self.lut = self.build_lut(1.0)
+            self.ctables = self.active.tables()
+        self.lut_bytes = b''.join(self.lut)
+
+    @classmethod
+    def build_lut(cls, intensity):
+        """
+        Build the encoding table: one 4 byte SPI pattern for each channel
+        value 0-255, already scaled by intensity.
+        """
+        buf_bytes = cls.buf_bytes
+        mask = 0x03
+        lut = []
+        for value in range(256):
+            value = min(int(value * intensity), 255)
+            lut.append(bytes((buf_bytes[value >> 6 & mask],
+                              buf_bytes[value >> 4 & mask],
+                              buf_bytes[value >> 2 & mask],
+                              buf_bytes[value & mask])))
+        return tuple(lut)
 
     def show(self, data):
         """
         Show RGB data on LEDs. Expected data = [(R, G, B), ...] where R, G and B
         are intensities of colors in range from 0 to 255. One RGB tuple for each
         LED. Count of tuples may be less than count of connected LEDs.
+
+        Only LEDs that differ from the previous frame are re-encoded.
         """
-        self.fill_buf(data)
-        self.send_buf()
+        end = self.set_range(0, data)
+
+        # turn off the rest of the LEDs, if any were on
+        off = (0, 0, 0)
+        for index in range(end, self.lit):
+            self.set_pixel(index, off)
+        self.lit = end
+
+        self.flush()
+
+    def set_pixel(self, index, color):
+        """
+        Set the color of a single LED. It is encoded straight away if it
+        changed, but not sent until flush().
+        """
+        red, green, blue = color
+        pixels = self.pixels
+        pos = index * 3
+        if pixels[pos] == red and pixels[pos+1] == green and pixels[pos+2] == blue:
+            return
+
+        pixels[pos] = red
+        pixels[pos+1] = green
+        pixels[pos+2] = blue
+
+        buf = self.buf
+        lut = self.lut
+        red_table, green_table, blue_table = self.ctables
+        index *= 12
+        buf[index:index+4] = lut[green_table[green]]
+        buf[index+4:index+8] = lut[red_table[red]]
+        buf[index+8:index+12] = lut[blue_table[blue]]
+
+        self.dirty = True
+        if pos >= self.lit * 3:
+            self.lit = pos // 3 + 1
+
+    def set_range(self, start, data):
+        """
+        Set the colors of consecutive LEDs starting at index start, encoding
+        only the ones that changed. Not sent until flush().
+
+        Returns the index of the first LED after the data
+        """
+        pixels = self.pixels
+        buf = self.buf
+        lut = self.lut
+        red_table, green_table, blue_table = self.ctables
+
+        pos = start * 3
+        index = start * 12
+        changed = False
+        for red, green, blue in data:
+            if pixels[pos] != red or pixels[pos+1] != green or pixels[pos+2] != blue:
+                pixels[pos] = red
+                pixels[pos+1] = green
+                pixels[pos+2] = blue
+                buf[index:index+4] = lut[green_table[green]]
+                buf[index+4:index+8] = lut[red_table[red]]
+                buf[index+8:index+12] = lut[blue_table[blue]]
+                changed = True
+            pos += 3
+            index += 12
+
+        end = pos // 3
+        if changed:
+            self.dirty = True
+            if end > self.lit:
+                self.lit = end
+        return end
+
+    def flush(self):
+        """
+        Send the buffer if anything changed since the last send.
+        """
+        if self.dirty:
+            self.send_buf()
+
+    def redraw(self):
+        """
+        Re-encode every LED from the last frame, e.g. after the encoding table
+        changed.
+        """
+        pixels = self.pixels
+        self.update_buf(zip(pixels[0::3], pixels[1::3], pixels[2::3]))
+        self.dirty = True
+
+    def commit(self, frame=None):
+        """
+        Show the back buffer self.frame, or frame (RGB bytes for every LED)
+        if given. LEDs that differ from the displayed frame are encoded,
+        then the buffer is sent. Nothing is allocated on
+        the heap, so an animation drawing into self.frame runs without GC
+        pauses except the ones the gc_every policy asks for.
+
+        The frame time and the bytes allocated while encoding are kept in
+        frame_us, max_frame_us and frame_alloc.
+        """
+        self.encode_frame(self.frame if frame is None else frame, self.ctables, False)
+
+    def dither(self):
+        """
+        Move the correction on to its next dither phase and re-encode every
+        LED of the displayed frame with it. Call once per frame, also when
+        nothing changed, to get the in-between brightness levels. Does
+        nothing without a correction.
+        """
+        if self.active is None:
+            return
+        self.ctables = self.active.next_phase()
+        self.encode_frame(self.pixels, self.ctables, True)
+
+    def encode_frame(self, frame, ctables, everything):
+        start = time.ticks_us()
+        alloc = gc.mem_alloc()
+
+        pixels = self.pixels
+        buf = self.buf
+        lut = self.lut_bytes
+        red_table, green_table, blue_table = ctables
+        length = len(frame)
+        changed = everything
+
+        pos = 0
+        index = 0
+        while pos < length:
+            red = frame[pos]
+            green = frame[pos+1]
+            blue = frame[pos+2]
+            if everything or pixels[pos] != red or pixels[pos+1] != green or pixels[pos+2] != blue:
+                pixels[pos] = red
+                pixels[pos+1] = green
+                pixels[pos+2] = blue
+
+                green = green_table[green] << 2
+                buf[index] = lut[green]
+                buf[index+1] = lut[green+1]
+                buf[index+2] = lut[green+2]
+                buf[index+3] = lut[green+3]
+                red = red_table[red] << 2
+                buf[index+4] = lut[red]
+                buf[index+5] = lut[red+1]
+                buf[index+6] = lut[red+2]
+                buf[index+7] = lut[red+3]
+                blue = blue_table[blue] << 2
+                buf[index+8] = lut[blue]
+                buf[index+9] = lut[blue+1]
+                buf[index+10] = lut[blue+2]
+                buf[index+11] = lut[blue+3]
+                changed = True
+            pos += 3
+            index += 12
+
+        self.frame_alloc = gc.mem_alloc() - alloc
+        if changed:
+            self.dirty = True
+            self.lit = self.led_count
+        self.flush()
+
+        self.frame_us = time.ticks_diff(time.ticks_us(), start)
+        if self.frame_us > self.max_frame_us:
+            self.max_frame_us = self.frame_us
+
+    def play_file(self, path, loops=0):
+        """
+        Play an animation file written by animfile.record(), looping it loops
+        times (0 = forever). Frames are read with readinto() straight into
+        the SPI buffer, or into self.frame for RGB files, at the file's fps.
+        LEDs past the file's led_count are turned off. Raises ValueError if
+        the file has no complete frame.
+        """
+        fmt = None
+        f = open(path, 'rb')
+        try:
+            fmt, led_count, frame_count, fps = animfile.read_header(f)
+            if led_count > self.led_count:
+                raise ValueError('File has {} LEDs, stripe has {}'.format(led_count, self.led_count))
+
+            size = animfile.frame_size(fmt, led_count)
+            if fmt == animfile.FMT_SPI:
+                buf = self.buf
+                for i in range(size, len(buf)):
+                    buf[i] = self.buf_bytes[0]
+                target = memoryview(buf)[:size]
+            else:
+                clear_frame(memoryview(self.frame)[size:])
+                target = memoryview(self.frame)[:size]
+            period = 1000000 // fps
+
+            loop = 0
+            deadline = time.ticks_us()
+            while loops == 0 or loop < loops:
+                f.seek(animfile.HEADER_SIZE)
+                shown = 0
+                for i in range(frame_count):
+                    if f.readinto(target) != size:
+                        break
+                    shown += 1
+                    if fmt == animfile.FMT_SPI:
+                        self.send_buf()
+                    else:
+                        self.commit()
+
+                    deadline = time.ticks_add(deadline, period)
+                    wait = time.ticks_diff(deadline, time.ticks_us())
+                    if wait > 0:
+                        time.sleep_us(wait)
+                    else:
+                        deadline = time.ticks_us()
+                if not shown:
+                    raise ValueError('No complete frame in {}'.format(path))
+                loop += 1
+        finally:
+            f.close()
+            if fmt == animfile.FMT_SPI:
+                # the SPI buffer no longer matches self.pixels
+                self.redraw()
+
+    def idle(self):
+        """
+        Collect garbage now. Call this from idle time when gc_every is 0.
+        """
+        gc.collect()
 
     def send_buf(self):
         """
         Send buffer over SPI.
         """
         self.spi.write(self.buf)
-        gc.collect()
+        self.dirty = False
+        self.frames += 1
+        if self.gc_every and self.frames % self.gc_every == 0:
+            gc.collect()
 
     def update_buf(self, data, start=0):
         """
@@ -75,43 +403,36 @@ class WS2812:
 
         Order of colors in buffer is changed from RGB to GRB because WS2812 LED
         has GRB order of colors. Each color is represented by 4 bytes in buffer
-        (1 byte for each 2 bits).
+        (1 byte for each 2 bits). The patterns come from the table built by
+        build_tables(), so each LED is just three slice copies.
 
-        Returns the index of the first unfilled LED
+        Unlike set_range(), every LED in data is re-encoded.
 
-        Note: If you find this function ugly, it's because speed optimisations
-        beated purity of code.
+        Returns the index of the first unfilled LED
         """
 
         buf = self.buf
-        buf_bytes = self.buf_bytes
-        intensity = self.intensity
+        lut = self.lut
+        red_table, green_table, blue_table = self.ctables
+        pixels = self.pixels
 
-        mask = 0x03
         index = start * 12
+        pos = start * 3
         for red, green, blue in data:
-            red = int(red * intensity)
-            green = int(green * intensity)
-            blue = int(blue * intensity)
-
-            buf[index] = buf_bytes[green >> 6 & mask]
-            buf[index+1] = buf_bytes[green >> 4 & mask]
-            buf[index+2] = buf_bytes[green >> 2 & mask]
-            buf[index+3] = buf_bytes[green & mask]
-
-            buf[index+4] = buf_bytes[red >> 6 & mask]
-            buf[index+5] = buf_bytes[red >> 4 & mask]
-            buf[index+6] = buf_bytes[red >> 2 & mask]
-            buf[index+7] = buf_bytes[red & mask]
-
-            buf[index+8] = buf_bytes[blue >> 6 & mask]
-            buf[index+9] = buf_bytes[blue >> 4 & mask]
-            buf[index+10] = buf_bytes[blue >> 2 & mask]
-            buf[index+11] = buf_bytes[blue & mask]
-
+            pixels[pos] = red
+            pixels[pos+1] = green
+            pixels[pos+2] = blue
+            pos += 3
+
+            buf[index:index+4] = lut[green_table[green]]
+            buf[index+4:index+8] = lut[red_table[red]]
+            buf[index+8:index+12] = lut[blue_table[blue]]
             index += 12
 
-        return index // 12
+        end = index // 12
+        if end > self.lit:
+            self.lit = end
+        return end
 
     def fill_buf(self, data):
         """
@@ -128,6 +449,12 @@ class WS2812:
             buf[index] = off
             index += 1
 
+        pixels = self.pixels
+        for index in range(end * 3, len(pixels)):
+            pixels[index] = 0
+        self.lit = end
+        self.dirty = True
+
 
 def color_gen(seq=0):
     while True:
@@ -144,7 +471,7 @@ def color_gen(seq=0):
         yield red, green, blue
 
 
-colors = color_gen()
+colors = colorgen.color_gen()
 
 
 def animation_1(led_count):
@@ -183,23 +510,122 @@ def animation_3(led_count, offset=10):
         step += 1
 
 
-stripe = WS2812(spi_bus=1, led_count=240, intensity=0.05)
+def make_palette(count=256):
+    """
+    Take count colors from the color generator and pack them as RGB bytes, so
+    the frame animations below can cycle through them without allocating.
+    """
+    palette = bytearray(count * 3)
+    for pos in range(0, count * 3, 3):
+        palette[pos], palette[pos+1], palette[pos+2] = next(colors)
+    return palette
+
 
-anim_2 = animation_2(stripe.led_count)
-anim_3 = animation_3(stripe.led_count)
-anim_4 = animation_2(stripe.led_count, 15, 5)
+def clear_frame(frame):
+    for pos in range(len(frame)):
+        frame[pos] = 0
 
-while True:
-    anim_1 = animation_1(stripe.led_count)
-    for i in range(240):
-        stripe.show(next(anim_1))
 
-    for i in range(120):
-        stripe.show(next(anim_2))
-        time.sleep_ms(50)
+def frame_animation_1(frame, palette):
+    """
+    animation_1 drawn in place into an RGB frame buffer, e.g. WS2812.frame.
+    """
+    length = len(frame)
+    colors_length = len(palette)
+    pos = 0
+    color = 0
+    clear_frame(frame)
+    while True:
+        frame[pos] = palette[color]
+        frame[pos+1] = palette[color+1]
+        frame[pos+2] = palette[color+2]
+        yield frame
+        pos = (pos + 3) % length
+        color = (color + 3) % colors_length
+
+
+def frame_animation_2(frame, palette, offset=3, length=1):
+    """
+    animation_2 drawn in place into an RGB frame buffer, e.g. WS2812.frame.
+    """
+    led_count = len(frame) // 3
+    colors_length = len(palette)
+    step = 0
+    color = 0
+    clear_frame(frame)
+    while True:
+        pos = step % led_count
+        red = palette[color]
+        green = palette[color+1]
+        blue = palette[color+2]
+        off = 0
+        while off < led_count:
+            index = (pos - off) % led_count * 3
+            frame[index] = red
+            frame[index+1] = green
+            frame[index+2] = blue
+            index = (pos - off - length) % led_count * 3
+            frame[index] = 0
+            frame[index+1] = 0
+            frame[index+2] = 0
+            off += offset
+        yield frame
+        step += 1
+        color = (color + 3) % colors_length
+
+
+def frame_animation_3(frame, palette, offset=10):
+    """
+    animation_3 drawn in place into an RGB frame buffer, e.g. WS2812.frame.
+    """
+    led_count = len(frame) // 3
+    colors_length = len(palette)
+    step = 0
+    color = 0
+    clear_frame(frame)
+    while True:
+        pos = step % led_count
+        red = palette[color]
+        green = palette[color+1]
+        blue = palette[color+2]
+        off = 0
+        while off < led_count:
+            index = (pos - off) % led_count * 3
+            frame[index] = red
+            frame[index+1] = green
+            frame[index+2] = blue
+            off += offset
+        yield frame
+        step += 1
+        color = (color + 3) % colors_length
+
+
+def print_stats(stripe, scheduler):
+    print('frame {} us, max {} us, alloc {} bytes'.format(
+        stripe.frame_us, stripe.max_frame_us, stripe.frame_alloc))
+    print(scheduler.stats())
+
+
+def run_demo():
+    stripe = WS2812(spi_bus=1, led_count=240, intensity=0.05, gc_every=0)
+    scheduler = animator.Scheduler(stripe, fps=30)
+    size = len(stripe.frame)
+    palette = make_palette()
+
+    # the animations resumed on every loop keep a frame of their own, so they
+    # go on from their own pixels rather than those of the one before
+    playlist = [
+        (lambda: frame_animation_1(stripe.frame, palette), 8000),
+        (frame_animation_2(bytearray(size), palette), 4000),
+        (frame_animation_3(bytearray(size), palette), 8000),
+        (frame_animation_2(bytearray(size), palette, 15, 5), 8000),
+    ]
+
+    while True:
+        scheduler.run(playlist, loop=False)
+        print_stats(stripe, scheduler)
+        scheduler.reset_stats()
 
-    for i in range(240):
-        stripe.show(next(anim_3))
 
-    for i in range(240):
-        stripe.show(next(anim_4))
+if __name__ == '__main__':
+    run_demo()
@@ -0,0 +1,126 @@
+"""
+Prebuilt HTTP responses for files that don't change, kept in RAM.
+
+The status line and headers with Content-Length are encoded once for each
+Connection mode, next to the body and a gzip compressed variant (a
+precompressed name.gz, or compressed here when the firmware can: the
+deflate module of MicroPython 1.21+, or gzip on CPython). Serving a request
+then only writes bytes that already exist, no stat(), open() or header
+formatting:
+
+    page = pagecache.StaticResponse(body, 'text/html')
+    (header, body) = page.get(accept_gzip, keep_alive)
+    response.write(header)
+    response.write(body)
+
+staticfiles.StaticFiles.preload() builds them for chosen files, e.g. the
+page itself. The body is kept once, not once per Connection mode, so a page
+costs its size (plus the compressed size) in RAM.
+
+Each page has an ETag (a hash of the body) and is sent with Cache-Control:
+no-cache, so browsers revalidate with If-None-Match and get the short 304
+response from not_modified() instead of the page.
+"""
+
+import binascii
+try:
+    import hashlib
+except ImportError:
+    import uhashlib as hashlib
+
+try:
+    import deflate
+    import io
+
+    def compress(data):
+        stream = io.BytesIO()
+        with deflate.DeflateIO(stream, deflate.GZIP) as f:
+            f.write(data)
+        return stream.getvalue()
+except ImportError:
+    try:
+        import gzip
+
+        def compress(data):
+            return gzip.compress(data)
+    except ImportError:
+        compress = None
+
+
+def make_etag(data):
+    """
+    Quoted ETag for data, from the first 8 bytes of its SHA-256.
+    """
+    return '"' + binascii.hexlify(hashlib.sha256(data).digest()[:8]).decode() + '"'
+
+
+def build_header(content_type, length, encoding=None, keep_alive=False, etag=None, cache_control=None):
+    header = "HTTP/1.1 200 OK\r\nContent-Type: {}\r\nContent-Length: {}\r\n".format(content_type, length)
+    if encoding:
+        header += "Content-Encoding: {}\r\n".format(encoding)
+    header += "Vary: Accept-Encoding\r\n"
+    if etag:
+        header += "ETag: {}\r\n".format(etag)
+    if cache_control:
+        header += "Cache-Control: {}\r\n".format(cache_control)
+    header += "Connection: keep-alive\r\n\r\n" if keep_alive else "Connection: close\r\n\r\n"
+    return header.encode()
+
+
+def build_not_modified(etag, cache_control=None, keep_alive=False):
+    header = "HTTP/1.1 304 Not Modified\r\nETag: {}\r\n".format(etag)
+    if cache_control:
+        header += "Cache-Control: {}\r\n".format(cache_control)
+    header += "Connection: keep-alive\r\n\r\n" if keep_alive else "Connection: close\r\n\r\n"
+    return header.encode()
+
+
+class StaticResponse:
+    def __init__(self, body, content_type='text/html', cache_control='no-cache', gzipped=None):
+        """
+        Params:
+        * body = page as str or bytes
+        * content_type = value of the Content-Type header
+        * cache_control = value of the Cache-Control header, None for none
+        * gzipped = body already gzip compressed, compressed here if None
+        """
+        if isinstance(body, str):
+            body = body.encode()
+
+        # the same weak ETag for the plain and the compressed variant
+        self.etag = "W/" + make_etag(body)
+        self.cache_control = cache_control
+        self.not_modified_responses = (build_not_modified(self.etag, cache_control, False),
+                                       build_not_modified(self.etag, cache_control, True))
+
+        self.plain = self.build(body, content_type)
+        self.gzip = None
+        if gzipped is None and compress is not None:
+            try:
+                gzipped = compress(body)
+            except Exception as e:  # e.g. the port can't compress
+                print("Compress error: {}".format(e))
+        if gzipped is not None and len(gzipped) < len(body):
+            self.gzip = self.build(gzipped, content_type, 'gzip')
+
+    def build(self, body, content_type, encoding=None):
+        # (header with Connection: close, header with Connection: keep-alive, body)
+        return (build_header(content_type, len(body), encoding, False, self.etag, self.cache_control),
+                build_header(content_type, len(body), encoding, True, self.etag, self.cache_control),
+                body)
+
+    def get(self, accept_gzip=False, keep_alive=False):
+        """
+        Returns (header, body), compressed if the client accepts gzip and a
+        compressed variant exists.
+        """
+        variant = self.plain
+        if accept_gzip and self.gzip is not None:
+            variant = self.gzip
+        return (variant[1] if keep_alive else variant[0], variant[2])
+
+    def not_modified(self, keep_alive=False):
+        """
+        Returns the full 304 response.
+        """
+        return self.not_modified_responses[1] if keep_alive else self.not_modified_responses[0]
@@ -0,0 +1,150 @@
+"""
+Bulk operations on a NeoPixel's pixel buffer.
+
+Works on the bytearray behind the NeoPixel with slice copies instead of a
+Python loop assigning one tuple per pixel:
+
+    import neopixel
+    import pixbuf
+
+    np = neopixel.NeoPixel(machine.Pin(14), 8)
+    pb = pixbuf.PixelBuffer(np)
+    pb.fill((0, 0, 32))
+    pb.set(0, (255, 255, 255))
+    pb.rotate(1)
+    np.write()
+
+For a neo1.CorrectedNeoPixel the colours as set (np.pixels) are used, so the
+correction is still applied on write().
+"""
+
+
+class PixelBuffer:
+    def __init__(self, np):
+        if hasattr(np, 'pixels'):
+            # neo1.CorrectedNeoPixel, keeps RGB order
+            self.buf = np.pixels
+            self.order = (0, 1, 2, 3)
+        else:
+            self.buf = np.buf
+            self.order = np.ORDER
+        self.bpp = np.bpp
+        self.n = np.n
+
+        self.mv = memoryview(self.buf)
+        self.pixel = bytearray(self.bpp)  # one pixel in buffer order
+        self.scratch = memoryview(bytearray(len(self.buf)))
+        self.table = bytearray(256)  # scale() lookup table for table_level
+        self.table_level = None
+
+    def pack(self, color):
+        """
+        Store color in self.pixel in the order of the buffer. An RGB color
+        on an RGBW strip gets white 0.
+        """
+        order = self.order
+        pixel = self.pixel
+        for i in range(self.bpp):
+            pixel[order[i]] = color[i] if i < len(color) else 0
+        return pixel
+
+    def set(self, index, color):
+        offset = index * self.bpp
+        self.mv[offset:offset + self.bpp] = self.pack(color)
+
+    def fill(self, color):
+        self.fill_range(0, self.n, color)
+
+    def fill_range(self, start, count, color):
+        """
+        Set count pixels from start to color. The first pixel is copied into
+        place, then the filled part is doubled until the range is full.
+        """
+        if count <= 0:
+            return
+        bpp = self.bpp
+        mv = self.mv
+        begin = start * bpp
+        total = count * bpp
+
+        mv[begin:begin + bpp] = self.pack(color)
+        filled = bpp
+        while filled < total:
+            chunk = min(filled, total - filled)
+            mv[begin + filled:begin + filled + chunk] = mv[begin:begin + chunk]
+            filled += chunk
+
+    def rotate(self, k):
+        """
+        Rotate the pixels k places towards the end of the strip (negative k
+        towards the start). Pixels pushed off one end come back at the other.
+        """
+        n = self.n
+        k %= n
+        if not k:
+            return
+        bpp = self.bpp
+        mv = self.mv
+        scratch = self.scratch
+        split = (n - k) * bpp
+        scratch[0:k * bpp] = mv[split:]
+        scratch[k * bpp:] = mv[:split]
+        mv[:] = scratch
+
+    def shift(self, k, color=(0, 0, 0)):
+        """
+        Shift the pixels k places like rotate(), filling the freed pixels
+        with color instead.
+        """
+        n = self.n
+        if abs(k) >= n:
+            self.fill(color)
+            return
+        self.rotate(k)
+        if k > 0:
+            self.fill_range(0, k, color)
+        elif k < 0:
+            self.fill_range(n + k, -k, color)
+
+    def copy(self, src, dst, count):
+        """
+        Copy count pixels starting at src to dst. The ranges may overlap.
+        """
+        bpp = self.bpp
+        size = count * bpp
+        src *= bpp
+        dst *= bpp
+        scratch = self.scratch
+        scratch[:size] = self.mv[src:src + size]
+        self.mv[dst:dst + size] = scratch[:size]
+
+    def scale(self, level):
+        """
+        Scale every channel by level / 256 (0-256, 256 leaves them as is).
+        The scaled values come from a 256 entry table, built when level
+        changes, and are looked up a pixel at a time.
+        """
+        if level >= 256:
+            return
+        table = self.table
+        if level != self.table_level:
+            for value in range(256):
+                table[value] = value * level >> 8
+            self.table_level = level
+
+        buf = self.buf
+        length = len(buf)
+        pos = 0
+        if self.bpp == 4:
+            while pos < length:
+                buf[pos] = table[buf[pos]]
+                buf[pos + 1] = table[buf[pos + 1]]
+                buf[pos + 2] = table[buf[pos + 2]]
+                buf[pos + 3] = table[buf[pos + 3]]
+                pos += 4
+        else:
+            while pos < length:
+                buf[pos] = table[buf[pos]]
+                buf[pos + 1] = table[buf[pos + 1]]
+                buf[pos + 2] = table[buf[pos + 2]]
+                pos += 3
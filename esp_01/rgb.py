@@ -3,12 +3,18 @@ from time import sleep
 
 
 class RGB:
-    def __init__(self):
+    def __init__(self, correction=None):
         # Set GPIO pins
         self.pin_r = 12
         self.pin_g = 5
         self.pin_b = 4
 
+        # Optional gamma.ColorCorrection with out_max=1023 for led_rgb()
+        self.correction = correction
+
+        # Current 10-bit (r, g, b) value
+        self.value = (0, 0, 0)
+
     def setup(self):
         pwm_freq = 1000
 
@@ -16,9 +22,7 @@ class RGB:
         self.pwm_g = PWM(Pin(self.pin_g), freq=pwm_freq)
         self.pwm_b = PWM(Pin(self.pin_b), freq=pwm_freq)
 
-        self.pwm_r.duty(0)
-        self.pwm_g.duty(0)
-        self.pwm_b.duty(0)
+        self.led_val(0, 0, 0)
 
     def close(self):
         self.pwm_r.deinit()
@@ -27,15 +31,22 @@ class RGB:
 
     def led_pct(self, r, g, b):
         # Input RGB values are by percentage
-        self.pwm_r.duty(int(r * 1023 / 100))
-        self.pwm_g.duty(int(g * 1023 / 100))
-        self.pwm_b.duty(int(b * 1023 / 100))
+        self.led_val(int(r * 1023 / 100), int(g * 1023 / 100), int(b * 1023 / 100))
+
+    def led_rgb(self, r, g, b):
+        # Input RGB values are 8-bit, corrected through the lookup tables
+        if self.correction is None:
+            self.led_val(r * 1023 // 255, g * 1023 // 255, b * 1023 // 255)
+        else:
+            r_table, g_table, b_table = self.correction.tables()
+            self.led_val(r_table[r], g_table[g], b_table[b])
 
     def led_val(self, r, g, b):
         # Input RGB values are by 10-bit value
         self.pwm_r.duty(r)
         self.pwm_g.duty(g)
         self.pwm_b.duty(b)
+        self.value = (r, g, b)
 
 
 if __name__ == '__main__':
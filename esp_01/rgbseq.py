@@ -0,0 +1,119 @@
+"""
+Play a timed list of colours on the RGB LED in rgb.py from a machine.Timer,
+so the web server stays free while the sequence runs.
+
+Each step is a 10-bit (r, g, b) colour and how long it is shown in ms:
+
+    import rgb
+    import rgbseq
+
+    led = rgb.RGB()
+    led.setup()
+    seq = rgbseq.Sequence(led)
+    seq.load([(1023, 0, 0, 500), (0, 1023, 0, 500), (0, 0, 1023, 500)])
+    seq.start(loop=True)
+
+Steps are kept in a preallocated array, so loading and playing a sequence
+allocates nothing per step.
+"""
+
+import struct
+from array import array
+from machine import Timer
+
+STEP_FORMAT = '>HHHH'  # r, g, b, ms, big endian; one step in the binary format
+STEP_SIZE = 8
+
+
+class Sequence:
+    MAX_STEPS = 128
+
+    def __init__(self, led, timer_id=-1):
+        """
+        Params:
+        * led = rgb.RGB to play on
+        * timer_id = machine.Timer to use, -1 is a virtual timer on the ESP8266
+        """
+        self.led = led
+        self.steps = array('H', [0] * (4 * self.MAX_STEPS))
+        self.count = 0
+        self.index = 0
+        self.loop = False
+        self.playing = False
+        self.timer = Timer(timer_id)
+        self.callback = self.step  # bound once, not on every step
+
+    def load(self, steps):
+        """
+        Load steps, a list of (r, g, b, ms). Raises ValueError if there are
+        too many or a value isn't an int in range; the loaded sequence is
+        kept then.
+        """
+        if len(steps) > self.MAX_STEPS:
+            raise ValueError("too many steps")
+        for (r, g, b, ms) in steps:
+            if type(r) is not int or type(g) is not int or type(b) is not int or type(ms) is not int:
+                raise ValueError("step not integers")  # not bool either
+            if not (0 <= r <= 1023 and 0 <= g <= 1023 and 0 <= b <= 1023 and 0 < ms <= 65535):
+                raise ValueError("step out of range")
+        self.stop()
+        data = self.steps
+        for i in range(len(steps)):
+            (r, g, b, ms) = steps[i]
+            data[4 * i] = r
+            data[4 * i + 1] = g
+            data[4 * i + 2] = b
+            data[4 * i + 3] = ms
+        self.count = len(steps)
+
+    def load_binary(self, buf):
+        """
+        Load steps packed in STEP_FORMAT, e.g. a request body. Like load(),
+        nothing changes if it raises ValueError.
+        """
+        if len(buf) % STEP_SIZE:
+            raise ValueError("partial step")
+        count = len(buf) // STEP_SIZE
+        if count > self.MAX_STEPS:
+            raise ValueError("too many steps")
+        for i in range(count):
+            (r, g, b, ms) = struct.unpack_from(STEP_FORMAT, buf, i * STEP_SIZE)
+            if r > 1023 or g > 1023 or b > 1023 or not ms:
+                raise ValueError("step out of range")
+        self.stop()
+        data = self.steps
+        for i in range(count):
+            (r, g, b, ms) = struct.unpack_from(STEP_FORMAT, buf, i * STEP_SIZE)
+            data[4 * i] = r
+            data[4 * i + 1] = g
+            data[4 * i + 2] = b
+            data[4 * i + 3] = ms
+        self.count = count
+
+    def start(self, loop=False):
+        self.stop()
+        if not self.count:
+            return
+        self.loop = loop
+        self.index = 0
+        self.playing = True
+        self.step()
+
+    def stop(self):
+        if self.playing:
+            self.timer.deinit()
+            self.playing = False
+
+    def step(self, timer=None):
+        if not self.playing:
+            return
+        if self.index == self.count:
+            if not self.loop:
+                self.playing = False
+                return
+            self.index = 0
+        data = self.steps
+        at = 4 * self.index
+        self.led.led_val(data[at], data[at + 1], data[at + 2])
+        self.index += 1
+        self.timer.init(period=data[at + 3], mode=Timer.ONE_SHOT, callback=self.callback)
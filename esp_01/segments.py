@@ -0,0 +1,112 @@
+"""
+Run independent animations on zones of one WS2812 strip.
+
+    import neo2
+    import segments
+
+    stripe = neo2.WS2812(spi_bus=1, led_count=240, intensity=0.05)
+    comp = segments.Compositor(stripe)
+    comp.add(segments.Segment(0, 120, neo2.animation_3(120)))
+    comp.add(segments.Segment(120, 120, neo2.animation_1(60), mirror=True, every=2))
+    while True:
+        comp.frame()
+
+Each segment's animation works in its own index range 0..length-1 and yields
+a list of (R, G, B) tuples, an RGB bytearray, or None when it has nothing new
+to show. Only segments that produced a frame are written, and the driver only
+re-encodes LEDs whose colour changed, so the frame time follows what changed
+rather than the number of segments. Where segments overlap the one added
+last wins.
+"""
+
+from array import array
+
+
+class Segment:
+    def __init__(self, start, length, animation, reverse=False, mirror=False, every=1):
+        """
+        Params:
+        * start = index of the first LED on the strip
+        * length = count of LEDs in the segment
+        * animation = generator for (length + 1) // 2 LEDs if mirror, else length
+        * reverse = run the animation from the end of the segment to the start
+        * mirror = draw the animation on the first half and mirrored on the second
+        * every = only step the animation every N compositor frames
+        """
+        self.start = start
+        self.length = length
+        self.animation = animation
+        self.every = every
+        self.simple = not reverse and not mirror
+
+        count = (length + 1) // 2 if mirror else length
+        self.targets = array('H', [0] * count)
+        for i in range(count):
+            self.targets[i] = start + (length - 1 - i if reverse else i)
+
+        self.mirrors = None
+        if mirror:
+            # LED for each logical index on the mirrored half, itself for the middle one
+            self.mirrors = array('H', [0] * count)
+            for i in range(count):
+                self.mirrors[i] = 2 * start + length - 1 - self.targets[i]
+
+    def draw(self, stripe, data):
+        """
+        Write one frame of the animation to the stripe.
+        """
+        if isinstance(data, (bytes, bytearray)):
+            data = zip(data[0::3], data[1::3], data[2::3])
+        elif self.simple:
+            if len(data) > self.length:
+                data = data[:self.length]  # don't spill into the next segment
+            stripe.set_range(self.start, data)
+            return
+
+        set_pixel = stripe.set_pixel
+        targets = self.targets
+        mirrors = self.mirrors
+        i = 0
+        count = len(targets)
+        for color in data:
+            if i >= count:
+                break
+            set_pixel(targets[i], color)
+            if mirrors is not None:
+                set_pixel(mirrors[i], color)
+            i += 1
+
+
+class Compositor:
+    def __init__(self, stripe):
+        self.stripe = stripe
+        self.segments = []
+        self.frames = 0
+        self.drawn = 0  # segments drawn in the last frame
+
+    def add(self, segment):
+        self.segments.append(segment)
+        return segment
+
+    def remove(self, segment):
+        self.segments.remove(segment)
+
+    def frame(self):
+        """
+        Step every segment that is due, draw the ones that produced a frame
+        and send the result if anything changed.
+        """
+        frames = self.frames
+        drawn = 0
+        for segment in self.segments:
+            if frames % segment.every:
+                continue
+            data = next(segment.animation)
+            if data is None:
+                continue
+            segment.draw(self.stripe, data)
+            drawn += 1
+
+        self.frames = frames + 1
+        self.drawn = drawn
+        self.stripe.flush()
@@ -0,0 +1,145 @@
+"""
+Serve files from a directory on flash, or from the SD card on the pyboard
+(mounted at /sd by pyboard/sd.py), with the HTTP server in httpcore.py.
+
+Files aren't read into RAM: the headers are buffered in the Response and
+the file is streamed after them with readinto() through the same buffer, so
+serving a file of any size takes the response buffer (1 KB) and no more.
+
+    import httpcore
+    import staticfiles
+
+    server = httpcore.HTTPServer()
+    server.default = staticfiles.StaticFiles('www').serve
+    server.run()
+
+/ is served as /index.html. If the client accepts gzip and there is a
+precompressed name.gz next to name, that is sent instead (host/gzip_www.py
+makes them). The Content-Type comes from the file extension. Responses have
+an ETag from the file size and modification time, so revisits get a 304.
+
+Files that are requested all the time, such as the page itself, can be
+preloaded into RAM as prebuilt responses (pagecache.py). They are then
+served without a stat(), open() or header formatting; changes to the file
+on flash aren't seen until the next preload().
+"""
+
+import os
+import httpcore
+import pagecache
+
+MIME_TYPES = {
+    'html': 'text/html',
+    'htm': 'text/html',
+    'css': 'text/css',
+    'js': 'application/javascript',
+    'json': 'application/json',
+    'txt': 'text/plain',
+    'svg': 'image/svg+xml',
+    'png': 'image/png',
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'gif': 'image/gif',
+    'ico': 'image/x-icon',
+}
+DEFAULT_TYPE = 'application/octet-stream'
+
+
+def mime_type(name):
+    dot = name.rfind('.')
+    if dot < 0:
+        return DEFAULT_TYPE
+    return MIME_TYPES.get(name[dot + 1:].lower(), DEFAULT_TYPE)
+
+
+def stat(name):
+    # (size, mtime), None if name isn't a file
+    try:
+        st = os.stat(name)
+    except OSError:
+        return None
+    if st[0] & 0x4000:  # directory
+        return None
+    return (st[6], st[8])
+
+
+class StaticFiles:
+    def __init__(self, root='www', cache_control='no-cache'):
+        """
+        Params:
+        * root = directory with the files, e.g. 'www' or '/sd/www'
+        * cache_control = value of the Cache-Control header; no-cache has
+          browsers revalidate with the ETag
+        """
+        self.root = root.rstrip('/')
+        self.cache_control = cache_control
+        self.cache = {}  # path: pagecache.StaticResponse
+
+    def preload(self, path):
+        """
+        Keep the file at path (e.g. '/index.html') in RAM as a prebuilt
+        response, with its name.gz if there is one.
+        """
+        name = self.root + path
+        with open(name, 'rb') as f:
+            body = f.read()
+        gzipped = None
+        if stat(name + '.gz') is not None:
+            with open(name + '.gz', 'rb') as f:
+                gzipped = f.read()
+        self.cache[path] = pagecache.StaticResponse(body, mime_type(path), self.cache_control, gzipped)
+
+    def serve(self, request, response):
+        """
+        Route handler answering the request with the file at its path.
+        """
+        path = str(request.path, 'utf-8')
+        if '..' in path or not path.startswith('/'):
+            response.error("404")
+            return
+        if path.endswith('/'):
+            path += 'index.html'
+
+        page = self.cache.get(path)
+        if page is not None:
+            if httpcore.etag_matches(request, page.etag):
+                response.write(page.not_modified(response.keep_alive))
+                return
+            (header, body) = page.get(request.header_has(b"accept-encoding", b"gzip"), response.keep_alive)
+            response.write(header)
+            response.write(body)
+            return
+
+        name = self.root + path
+
+        encoding = None
+        info = None
+        if request.header_has(b"accept-encoding", b"gzip"):
+            info = stat(name + '.gz')
+            if info is not None:
+                encoding = 'gzip'
+        if info is None:
+            info = stat(name)
+            if info is None:
+                response.error("404")
+                return
+        (size, mtime) = info
+
+        etag = '"{:x}-{:x}{}"'.format(size, mtime, '-gz' if encoding else '')
+        headers = ["ETag: " + etag, "Vary: Accept-Encoding"]
+        if self.cache_control:
+            headers.append("Cache-Control: " + self.cache_control)
+        if httpcore.etag_matches(request, etag):
+            response.not_modified(etag, self.cache_control)
+            return
+        if encoding:
+            headers.append("Content-Encoding: " + encoding)
+            name += '.gz'
+
+        try:
+            f = open(name, 'rb')
+        except OSError:
+            response.error("404")
+            return
+        response.start("200", size, mime_type(path), headers)
+        response.file = f
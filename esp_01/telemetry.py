@@ -0,0 +1,131 @@
+"""
+Periodic telemetry for MQTT devices, as an asyncio task next to the MQTT
+loop, instead of answering STATUS requests one round trip at a time.
+
+Every interval the registered values are read and the ones that changed
+by more than their tolerance since they were last published go out
+together in one small JSON message, with the uptime. When nothing changed
+nothing is sent, except that every full_every intervals all values are
+sent as a heartbeat. So a quiet device costs one message per
+interval * full_every, not one per interval.
+
+    t = telemetry.Telemetry(session.publish, 'assist/system', {'mac': mac})
+    t.add('mem', telemetry.free_heap, 1)
+    t.add('led', lambda: led.value())
+    asyncio.create_task(t.run())
+
+The asyncio loop's latency (how late a sleep of sample_ms wakes up, avg
+and max over the interval, in ms) is in every message as lag and lagmax:
+it shows a handler or flash write holding up the loop. A change of more
+than 5 or 20 ms sends a message by itself.
+"""
+
+import gc
+import utime as time
+
+try:
+    import json
+except ImportError:
+    import ujson as json
+
+import mqtt_async
+
+
+def free_heap():
+    """
+    Free heap in % with one decimal, as utils.free() reports it.
+    """
+    gc.collect()
+    free = gc.mem_free()
+    return round(free * 100 / (free + gc.mem_alloc()), 1)
+
+
+class Telemetry:
+    def __init__(self, publish, topic, fields=None, interval=60, full_every=10, sample_ms=100):
+        """
+        Params:
+        * publish = function(topic, msg), e.g. mqtt_session.Session.publish
+        * topic = topic for the messages
+        * fields = dict of constant values put in every message, e.g. the mac
+        * interval = seconds between samples
+        * full_every = send all values every this many intervals
+        * sample_ms = period of the loop latency probe
+        """
+        self.publish = publish
+        self.topic = topic
+        self.fields = fields or {}
+        self.interval = interval
+        self.full_every = full_every
+        self.sample_ms = sample_ms
+        self.sources = []  # (name, read, tolerance)
+        self.last = {}  # values as last published
+        self.count = 0
+        self.uptime_ms = time.ticks_ms()  # since boot; added up from here on, ticks wrap
+        self.lag_total = 0
+        self.lag_samples = 0
+        self.lag_max = 0
+        self.sent = 0
+        self.suppressed = 0
+        self.add('lag', self.lag_avg, 5)
+        self.add('lagmax', lambda: self.lag_max, 20)
+
+    def add(self, name, read, tolerance=0):
+        """
+        Params:
+        * name = key in the message, keep it short
+        * read = function returning the current value (number or string)
+        * tolerance = changes up to this much aren't worth a message;
+          only for numbers
+        """
+        self.sources.append((name, read, tolerance))
+
+    def lag_avg(self):
+        return self.lag_total // self.lag_samples if self.lag_samples else 0
+
+    def sample(self, full=False):
+        """
+        Read the values. Returns the message as a dict, None if nothing
+        changed enough.
+        """
+        msg = None
+        last = self.last
+        for (name, read, tolerance) in self.sources:
+            value = read()
+            if not full and name in last:
+                old = last[name]
+                if value == old or (tolerance and abs(value - old) <= tolerance):
+                    continue
+            if msg is None:
+                msg = dict(self.fields)
+            msg[name] = value
+            last[name] = value
+        if msg is not None:
+            msg['lag'] = last['lag'] = self.lag_avg()
+            msg['lagmax'] = last['lagmax'] = self.lag_max
+            msg['up'] = self.uptime_ms // 1000
+        return msg
+
+    async def run(self):
+        interval = self.interval * 1000
+        while True:
+            start = time.ticks_ms()
+            self.lag_total = self.lag_samples = self.lag_max = 0
+            elapsed = 0
+            while elapsed < interval:
+                due = time.ticks_add(time.ticks_ms(), self.sample_ms)
+                await mqtt_async.sleep_ms(self.sample_ms)
+                lag = max(0, time.ticks_diff(time.ticks_ms(), due))
+                self.lag_total += lag
+                self.lag_samples += 1
+                if lag > self.lag_max:
+                    self.lag_max = lag
+                elapsed = time.ticks_diff(time.ticks_ms(), start)
+            self.uptime_ms += elapsed
+
+            msg = self.sample(self.count % self.full_every == 0)
+            self.count += 1
+            if msg is None:
+                self.suppressed += 1
+            else:
+                self.sent += 1
+                self.publish(self.topic, json.dumps(msg))
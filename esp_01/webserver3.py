@@ -1,16 +1,19 @@
-import network
-import socket
 from machine import Pin
+import httpcore
 
 
-class WebServer:
+class WebServer(httpcore.HTTPServer):
     TITLE = "LED Control"
     GPIO_NUM = 5
 
     def __init__(self):
+        super().__init__()
         self.pin = Pin(self.GPIO_NUM)
         self.pin.init(Pin.OUT)
         self.led_off()
+        self.route(b"GET", b"/", self.index)
+        self.route(b"POST", b"/on", self.on)
+        self.route(b"POST", b"/off", self.off)
 
     def led_off(self):
         self.pin.on()
@@ -18,74 +21,46 @@ class WebServer:
     def led_on(self):
         self.pin.off()
 
-    def ok(self, socket, query):
-        socket.write("HTTP/1.1 OK\r\n\r\n")
-        socket.write("<!DOCTYPE html><title>"+self.TITLE+"</title><body>")
-        socket.write(self.TITLE+" status: ")
-        if not self.pin.value():
-            socket.write("<span style='color:green'>ON</span>")
-        else:
-            socket.write("<span style='color:red'>OFF</span>")
+    def on(self, request, response):
+        self.led_on()
+        self.ok(request, response)
 
-        socket.write("<br>")
+    def off(self, request, response):
+        self.led_off()
+        self.ok(request, response)
 
-        if not self.pin.value():
-            socket.write("<form method='POST' action='/off?"+query.decode()+"'>"+
-                         "<input type='submit' value='turn OFF'>"+
-                         "</form>")
-        else:
-            socket.write("<form method='POST' action='/on?"+query.decode()+"'>"+
-                         "<input type='submit' value='turn ON'>"+
-                         "</form>")
+    def etag(self):
+        # the status page only changes with the pin
+        return '"led-' + str(self.pin.value()) + '"'
 
-    def err(self, socket, code, message):
-        socket.write("HTTP/1.1 "+code+" "+message+"\r\n\r\n")
-        socket.write("<h1>"+message+"</h1>")
+    def index(self, request, response):
+        etag = self.etag()
+        if httpcore.etag_matches(request, etag):
+            response.not_modified(etag)
+        else:
+            self.ok(request, response, ["ETag: " + etag, "Cache-Control: no-cache"])
 
-    def handle(self, socket):
-        (method, url, version) = socket.readline().split(b" ")
-        if b"?" in url:
-            (path, query) = url.split(b"?", 2)
+    def ok(self, request, response, headers=None):
+        query = str(request.query, 'utf-8')
+        body = "<!DOCTYPE html><title>"+self.TITLE+"</title><body>"
+        body += self.TITLE+" status: "
+        if not self.pin.value():
+            body += "<span style='color:green'>ON</span>"
         else:
-            (path, query) = (url, b"")
-        while True:
-            header = socket.readline()
-            if header == b"":
-                return
-            if header == b"\r\n":
-                break
+            body += "<span style='color:red'>OFF</span>"
 
-        if version != b"HTTP/1.0\r\n" and version != b"HTTP/1.1\r\n":
-            self.err(socket, "505", "Version Not Supported")
-        elif method == b"GET":
-            if path == b"/":
-                self.ok(socket, query)
-            else:
-                self.err(socket, "404", "Not Found")
-        elif method == b"POST":
-            if path == b"/on":
-                self.led_on()
-                self.ok(socket, query)
-            elif path == b"/off":
-                self.led_off()
-                self.ok(socket, query)
-            else:
-                self.err(socket, "404", "Not Found")
+        body += "<br>"
+
+        if not self.pin.value():
+            body += ("<form method='POST' action='/off?"+query+"'>"+
+                     "<input type='submit' value='turn OFF'>"+
+                     "</form>")
         else:
-            self.err(socket, "501", "Not Implemented")
+            body += ("<form method='POST' action='/on?"+query+"'>"+
+                     "<input type='submit' value='turn ON'>"+
+                     "</form>")
 
-    def run(self):
-        server = socket.socket()
-        server.bind(('0.0.0.0', 80))
-        server.listen(1)
-        while True:
-            try:
-                (sckt, sockaddr) = server.accept()
-                self.handle(sckt)
-            except:
-                sckt.write("HTTP/1.1 500 Internal Server Error\r\n\r\n")
-                sckt.write("<h1>Internal Server Error</h1>")
-                sckt.close()
+        response.send("200", body, headers=headers)
 
 
 if __name__ == '__main__':
@@ -1,139 +1,115 @@
-import socket
+import struct
+try:
+    import json
+except ImportError:
+    import ujson as json
 import rgb
+import rgbseq
+import httpcore
+import staticfiles
 
 
-class WebServer:
-    TITLE = "RGB LED Control"
-    HTML_DOC = """
-<!DOCTYPE html>
-<html>
-<head>
-    <meta charset="utf-8">
-    <meta http-equiv="X-UA-Compatible" content="IE=edge">
-    <meta name="viewport" content="width=device-width, initial-scale=1">
-    <link rel="stylesheet" href="https://maxcdn.bootstrapcdn.com/bootstrap/3.3.6/css/bootstrap.min.css">
-    <script src="https://maxcdn.bootstrapcdn.com/bootstrap/3.3.6/js/bootstrap.min.js"></script>
-    <script src="https://cdnjs.cloudflare.com/ajax/libs/jscolor/2.0.4/jscolor.min.js"></script>
-</head>
-<body>
-<div class="container">
-    <div class="row">
-        <h1>RGB Color Picker</h1>
-        <a type="submit" id="change_color" type="button" class="btn btn-primary">Change Color</a>
-        <input class="jscolor {onFineChange:'update(this)'}" id="rgb">
-    </div>
-</div>
-<script>
-    function update(picker) {
-        document.getElementById('rgb').innerHTML = Math.round(picker.rgb[0]) + ', ' +  Math.round(picker.rgb[1]) + ', ' + Math.round(picker.rgb[2]);
-        document.getElementById("change_color").href="?r=" + Math.round(picker.rgb[0]*4.0117) + "&g=" +  Math.round(picker.rgb[1]*4.0117) + "&b=" + Math.round(picker.rgb[2]*4.0117);
-    }
-</script>
-</body>
-</html>
-    """
+class WebServer(httpcore.HTTPServer):
+    WWW_ROOT = 'www'  # the page and its assets; '/sd/www' on a pyboard SD card
+    # room for a binary sequence of rgbseq.Sequence.MAX_STEPS (1 KB) and its
+    # headers; a JSON sequence takes up to 27 bytes a step, so 45 or so steps fit
+    MAX_REQUEST_SIZE = 1536
+    PRELOAD = ('/index.html',)  # kept in RAM as prebuilt responses, see staticfiles
 
     def __init__(self):
+        super().__init__()
         self.led = rgb.RGB()
         self.led.setup()
-
-    def ok(self, req, query):
-        conn, addr = req
-        conn.send(b"HTTP/1.1 200 OK\r\n")
-        conn.send(b"Content-Type: text/html\r\n")
-        conn.send(b"Connection: close\r\n\r\n")
-
+        self.sequence = rgbseq.Sequence(self.led)
+        self.files = staticfiles.StaticFiles(self.WWW_ROOT)
+        for path in self.PRELOAD:
+            self.files.preload(path)
+        self.default = self.files.serve
+        self.route(b"GET", b"/", self.index)
+        self.route(b"GET", b"/api/rgb", self.get_rgb)
+        self.route(b"PUT", b"/api/rgb", self.put_rgb)
+        self.route(b"POST", b"/api/rgb/play", self.play)
+        self.route(b"DELETE", b"/api/rgb/play", self.stop)
+
+    def index(self, request, response):
+        query = request.query
+        self.set_color(str(query, 'utf-8') if len(query) else "", request.addr)
+        self.files.serve(request, response)
+
+    def set_color(self, query, addr):
         if query != "":
-            # print(query)
-            query_str = query.split('&')
-            params = dict([param.split('=') for param in query_str])
-            # print('r@' + params['r'])
-            # print('g@' + params['g'])
-            # print('b@' + params['b'])
+            params = httpcore.parse_query(query)
             print("Request [{}] - R({}) G({}) B({})".format(addr[0], params['r'], params['g'], params['b']))
 
+            self.sequence.stop()
             self.led.led_val(int(params['r']), int(params['g']), int(params['b']))
-
-        conn.sendall(self.HTML_DOC.encode())
+            self.color_changed()
+
+    def color_changed(self):
+        """
+        Called after a request set the colour. Servers that push the state
+        to clients override this.
+        """
+        pass
+
+    # API: colours are 10-bit (0-1023). Bodies are JSON, or binary with
+    # Content-Type: application/octet-stream:
+    #   PUT /api/rgb         {"r": 1023, "g": 0, "b": 512} or 3 big endian uint16
+    #   GET /api/rgb         same as PUT, binary if the Accept header asks for it
+    #   POST /api/rgb/play   {"steps": [[r, g, b, ms], ...], "loop": true} or
+    #                        rgbseq.STEP_FORMAT records, ?loop=1 to repeat;
+    #                        larger than MAX_REQUEST_SIZE gets 413
+    #   DELETE /api/rgb/play stop playing
 
     @staticmethod
-    def err(conn, code, message):
-        conn.send(("HTTP/1.1 " + code + " " + message + "\r\n\r\n").encode())
-        conn.send(("<h1>" + message + "</h1>").encode())
+    def binary(request):
+        return request.header_has(b"content-type", b"application/octet-stream")
 
-    def handle(self, req):
-        conn, addr = req
-        conn.settimeout(1)
+    def get_rgb(self, request, response):
+        (r, g, b) = self.led.value
+        if request.header_has(b"accept", b"application/octet-stream"):
+            response.send("200", struct.pack('>HHH', r, g, b), 'application/octet-stream', ["Cache-Control: no-store"])
+        else:
+            response.send("200", '{"r":%d,"g":%d,"b":%d}' % (r, g, b), 'application/json', ["Cache-Control: no-store"])
+
+    def put_rgb(self, request, response):
+        body = request.body
         try:
-            recv_data = b""
-            while True:
-                chunk = conn.recv(1024)
-                recv_data += chunk
-                if recv_data[-4:] == b'\r\n\r\n' or chunk == b'' or not chunk:
-                    break
-        except OSError as e:
-            if e.args[0] == "timed out" or e.args[0] == 110:  # ETIMEDOUT
-                print("Socket Timeout - {}:{}".format(addr[0], addr[1]))
+            if self.binary(request):
+                if len(body) != 6:
+                    raise ValueError("need 6 bytes")
+                (r, g, b) = struct.unpack('>HHH', body)
             else:
-                print("OSError: {}".format(e))
-        except Exception as e:
-            print("Recv error: {}".format(e))
+                data = json.loads(str(body, 'utf-8'))
+                (r, g, b) = (int(data['r']), int(data['g']), int(data['b']))
+            if not (0 <= r <= 1023 and 0 <= g <= 1023 and 0 <= b <= 1023):
+                raise ValueError("out of range")
+        except (ValueError, KeyError, TypeError):
+            response.error("400")
+            return
+        self.sequence.stop()
+        self.led.led_val(r, g, b)
+        self.color_changed()
+        response.no_content()
 
-        # print("recv_data: '{}'".format(recv_data))
-        data = recv_data.decode()
+    def play(self, request, response):
+        loop = httpcore.parse_query(request.query).get('loop') == '1'
         try:
-            if len(data) == 0:
-                return
+            if self.binary(request):
+                self.sequence.load_binary(request.body)
             else:
-                (method, url, version) = data.split('\r\n')[0].split(' ')
-        except ValueError:
-            print("Data Error: " + data)
+                data = json.loads(str(request.body, 'utf-8'))
+                self.sequence.load(data['steps'])
+                loop = loop or bool(data.get('loop'))
+        except (ValueError, KeyError, TypeError):
+            response.error("400")
             return
+        self.sequence.start(loop)
+        response.no_content()
 
-        if "?" in url:
-            (path, query) = url.split("?", 2)
-        else:
-            (path, query) = (url, "")
-
-        # print(method)
-        # print(url)
-        # print(version)
-
-        if version != "HTTP/1.0" and version != "HTTP/1.1":
-            self.err(conn, "505", "Version Not Supported")
-        elif method == "GET":
-            if path == "/":
-                self.ok(req, query)
-            else:
-                self.err(conn, "404", "Not Found")
-        else:
-            self.err(conn, "501", "Not Implemented")
-
-    def run(self):
-        host = socket.getaddrinfo('0.0.0.0', 80)[0][-1]
-        server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        server.bind(host)
-        server.listen(5)
-        print("Server started on {}".format(host))
-        while True:
-            try:
-                request = server.accept()
-                # print(request)
-                conn, addr = request
-                self.handle(request)
-            except Exception as e:
-                print(e)
-                try:
-                    conn.send(b"HTTP/1.1 500 Internal Server Error\r\n\r\n")
-                    conn.send(b"<h1>Internal Server Error</h1>")
-                except:
-                    print("Error processing HTTP 500")
-            finally:
-                try:
-                    conn.close()
-                    print("Closed Connection")
-                except:
-                    print("Error closing socket")
+    def stop(self, request, response):
+        self.sequence.stop()
+        response.no_content()
 
 
 def start():
@@ -0,0 +1,229 @@
+"""
+uasyncio version of the RGB LED server in webserver4.
+
+Each connection is served by its own task, so a slow or idle browser no
+longer holds up the others. The number of open connections is capped and
+every connection gets a timeout. Connections are kept alive between
+requests like in webserver4.
+
+The page's colour picker talks to /ws, a WebSocket that takes 6-byte binary
+(three big endian uint16, 0-1023) or JSON {"r":..,"g":..,"b":..} colour
+frames. One task applies only the latest colour received, then pushes the
+new state to every connected client as a 6-byte frame.
+
+Runs next to other tasks in the same event loop:
+
+    import uasyncio as asyncio
+    import webserver5
+
+    async def main():
+        ws = webserver5.AsyncWebServer()
+        await ws.start()
+        await other_task()  # e.g. MQTT or button handling
+
+    asyncio.run(main())
+"""
+
+try:
+    import uasyncio as asyncio
+except ImportError:
+    import asyncio
+
+import struct
+try:
+    import json
+except ImportError:
+    import ujson as json
+
+import httpcore
+import httpreader
+import websock
+import webserver4
+
+
+class AsyncWebServer(webserver4.WebServer):
+    MAX_CONNECTIONS = 4
+    TIMEOUT = 5  # seconds to receive the first request
+    IDLE_TIMEOUT = 5  # seconds to wait for the next request on an open connection
+    BACKLOG = 5
+    MAX_CLIENTS = 4  # WebSocket clients, on top of MAX_CONNECTIONS
+
+    def __init__(self):
+        super().__init__()
+        self.reader = None  # each connection gets its own, see serve()
+        # self.response is only used for errors, sent without an await in between
+        self.connections = 0
+        self.rejected = 0
+        self.server = None
+        self.clients = []
+        self.latest = None  # colour received over a WebSocket, not applied yet
+        self.changed = asyncio.Event()
+        self.state = bytearray(6)
+
+    def color_changed(self):
+        self.changed.set()
+
+    async def apply_colors(self):
+        """
+        Apply the latest colour from the WebSocket clients and push the state
+        to all of them. Colours received while this runs are coalesced.
+        """
+        while True:
+            await self.changed.wait()
+            self.changed.clear()
+            if self.latest is not None:
+                (r, g, b) = self.latest
+                self.latest = None
+                self.sequence.stop()
+                self.led.led_val(r, g, b)
+            await self.broadcast()
+
+    async def broadcast(self):
+        (r, g, b) = self.led.value
+        struct.pack_into('>HHH', self.state, 0, r, g, b)
+        clients = []
+        for ws in self.clients[:]:
+            try:
+                # MicroPython writes to the socket right away
+                ws.write(self.state)
+            except OSError:
+                self.clients.remove(ws)  # reset by the peer, websocket() ends on its next recv()
+                continue
+            clients.append(ws)
+        for ws in clients:
+            try:
+                await ws.writer.drain()
+            except OSError:
+                if ws in self.clients:
+                    self.clients.remove(ws)
+
+    @staticmethod
+    def parse_color(opcode, payload):
+        if opcode == websock.OP_BINARY:
+            if len(payload) != 6:
+                raise ValueError("need 6 bytes")
+            (r, g, b) = struct.unpack('>HHH', payload)
+        else:
+            data = json.loads(str(payload, 'utf-8'))
+            (r, g, b) = (int(data['r']), int(data['g']), int(data['b']))
+        if not (0 <= r <= 1023 and 0 <= g <= 1023 and 0 <= b <= 1023):
+            raise ValueError("out of range")
+        return (r, g, b)
+
+    async def websocket(self, request, stream, writer):
+        if len(self.clients) >= self.MAX_CLIENTS:
+            await self.send_error(writer, "503")
+            return
+        ws = websock.WebSocket(stream, writer)
+        await ws.accept(request)
+        self.clients.append(ws)
+        try:
+            (r, g, b) = self.led.value
+            await ws.send(struct.pack('>HHH', r, g, b))
+            while True:
+                (opcode, payload) = await ws.recv()
+                if opcode == websock.OP_CLOSE:
+                    break
+                try:
+                    self.latest = self.parse_color(opcode, payload)
+                except (ValueError, KeyError, TypeError):
+                    continue
+                self.changed.set()
+        except OSError:
+            pass
+        except Exception as e:
+            # the connection isn't HTTP any more, serve() mustn't answer 500
+            print(e)
+            await ws.close(1011)
+        finally:
+            if ws in self.clients:  # broadcast() drops clients it can't write to
+                self.clients.remove(ws)
+
+    async def send_error(self, writer, code):
+        self.response.begin(writer.write)
+        self.response.error(code)
+        self.response.flush()
+        await writer.drain()
+
+    async def serve(self, stream, writer):
+        addr = writer.get_extra_info('peername')
+        try:
+            sock = writer.get_extra_info('socket')
+        except KeyError:  # uasyncio only knows peername
+            sock = getattr(writer, 's', None)
+        if sock is not None:
+            httpcore.no_delay(sock)
+        served = 0
+        try:
+            if self.connections >= self.MAX_CONNECTIONS:
+                self.rejected += 1
+                await self.send_error(writer, "503")
+                return
+
+            self.connections += 1
+            try:
+                # files are streamed with awaits in between, so every
+                # connection needs its own response buffer too
+                request = httpreader.RequestReader(self.MAX_REQUEST_SIZE)
+                response = httpcore.Response(self.RESPONSE_SIZE)
+                request.reset(addr)
+                timeout = self.TIMEOUT
+                while served < self.MAX_REQUESTS:
+                    if not await asyncio.wait_for(request.read_request_async(stream), timeout):
+                        break
+                    served += 1
+                    if request.path == b"/ws" and websock.is_upgrade(request):
+                        self.connections -= 1  # counted in MAX_CLIENTS instead
+                        try:
+                            await self.websocket(request, stream, writer)
+                        finally:
+                            self.connections += 1
+                        break
+                    keep_alive = self.dispatch(request, response, writer.write, served < self.MAX_REQUESTS)
+                    await response.finish_async(writer.drain)
+                    if not keep_alive:
+                        break
+                    request.next()
+                    timeout = self.IDLE_TIMEOUT
+            finally:
+                self.connections -= 1
+        except httpreader.RequestError as e:
+            print("Request error {} - {}:{}".format(e.args[0], addr[0], addr[1]))
+            await self.send_error(writer, e.args[0])
+        except asyncio.TimeoutError:
+            if served == 0:
+                print("Socket Timeout - {}:{}".format(addr[0], addr[1]))
+        except Exception as e:
+            print(e)
+            try:
+                await self.send_error(writer, "500")
+            except Exception:
+                print("Error processing HTTP 500")
+        finally:
+            writer.close()
+            await writer.wait_closed()
+
+    async def start(self, host='0.0.0.0', port=80):
+        """
+        Start listening and return; the connections are served by tasks in
+        the running event loop.
+        """
+        self.server = await asyncio.start_server(self.serve, host, port, backlog=self.BACKLOG)
+        self.applier = asyncio.create_task(self.apply_colors())
+        print("Server started on {}:{}".format(host, port))
+        return self.server
+
+
+async def main():
+    ws = AsyncWebServer()
+    await ws.start()
+    while True:
+        await asyncio.sleep(3600)
+
+
+def start():
+    asyncio.run(main())
+
+
+if __name__ == '__main__':
+    start()
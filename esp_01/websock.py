@@ -0,0 +1,132 @@
+"""
+Minimal WebSocket (RFC 6455) server side for uasyncio/asyncio streams.
+
+Made for small messages such as colour updates: frames up to MAX_PAYLOAD
+bytes. Fragmented messages aren't supported, the connection is closed with
+1003 when one starts. Incoming frames are read into one preallocated buffer
+per connection and unmasked in place; recv() returns the payload as a
+memoryview into it. Pings are answered and a close is returned as OP_CLOSE.
+
+    if websock.is_upgrade(request):
+        ws = websock.WebSocket(stream, writer)
+        await ws.accept(request)
+        while True:
+            (opcode, payload) = await ws.recv()
+            if opcode == websock.OP_CLOSE:
+                break
+            ...
+
+(Not named websocket.py, which is a MicroPython built-in module used by
+WebREPL.)
+"""
+
+import binascii
+try:
+    import hashlib
+except ImportError:
+    import uhashlib as hashlib
+
+import httpreader
+
+GUID = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+OP_TEXT = 0x1
+OP_BINARY = 0x2
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xa
+
+MAX_PAYLOAD = 125  # fits the 7 bit length, no extended length needed
+
+
+def is_upgrade(request):
+    """
+    True if the request (httpreader.RequestReader) asks for a WebSocket.
+    """
+    return request.header_has(b"upgrade", b"websocket") and request.header(b"sec-websocket-key") is not None
+
+
+def accept_key(key):
+    return binascii.b2a_base64(hashlib.sha1(bytes(key) + GUID).digest()).strip()
+
+
+class WebSocket:
+    def __init__(self, stream, writer):
+        self.stream = stream
+        self.writer = writer
+        self.buf = bytearray(2 + 4 + MAX_PAYLOAD)  # header, mask, payload
+        self.mv = memoryview(self.buf)
+        self.out = bytearray(2 + MAX_PAYLOAD)
+        self.closed = False
+
+    async def accept(self, request):
+        """
+        Answer the upgrade request with 101 Switching Protocols.
+        """
+        self.writer.write(b"HTTP/1.1 101 Switching Protocols\r\n" +
+                          b"Upgrade: websocket\r\nConnection: Upgrade\r\n" +
+                          b"Sec-WebSocket-Accept: " + accept_key(request.header(b"sec-websocket-key")) +
+                          b"\r\n\r\n")
+        await self.writer.drain()
+
+    async def read_into(self, start, end):
+        while start < end:
+            n = await httpreader.stream_recv_into(self.stream, self.mv[start:end])
+            if not n:
+                raise OSError("connection closed")
+            start += n
+
+    async def recv(self):
+        """
+        Wait for the next data frame. Returns (opcode, payload); payload is
+        only valid until the next call.
+        """
+        buf = self.buf
+        while True:
+            await self.read_into(0, 2)
+            opcode = buf[0] & 0x0f
+            length = buf[1] & 0x7f
+            if not buf[1] & 0x80 or length > MAX_PAYLOAD:
+                # clients must mask; longer frames aren't supported
+                await self.close(1002 if not buf[1] & 0x80 else 1009)
+                return (OP_CLOSE, self.mv[2:2])
+            if not buf[0] & 0x80 or opcode == 0:
+                # FIN not set or a continuation: a fragmented message
+                await self.close(1003)
+                return (OP_CLOSE, self.mv[2:2])
+            await self.read_into(2, 6 + length)
+            for i in range(length):
+                buf[6 + i] ^= buf[2 + (i & 3)]
+            payload = self.mv[6:6 + length]
+
+            if opcode == OP_PING:
+                await self.send(payload, OP_PONG)
+            elif opcode == OP_CLOSE:
+                await self.close()
+                return (OP_CLOSE, payload)
+            elif opcode != OP_PONG:
+                return (opcode, payload)
+
+    def write(self, payload, opcode=OP_BINARY):
+        """
+        Queue a frame on the writer without waiting; see send().
+        """
+        length = len(payload)
+        out = self.out
+        out[0] = 0x80 | opcode
+        out[1] = length
+        out[2:2 + length] = payload
+        self.writer.write(memoryview(out)[:2 + length])
+
+    async def send(self, payload, opcode=OP_BINARY):
+        self.write(payload, opcode)
+        await self.writer.drain()
+
+    async def close(self, code=1000):
+        if self.closed:
+            return
+        self.closed = True
+        try:
+            await self.send(bytes((code >> 8, code & 0xff)), OP_CLOSE)
+        except OSError:
+            pass
@@ -0,0 +1,66 @@
+// Colour picker for webserver4/webserver5. Colours are sent as 10-bit values
+// (0-1023) over a WebSocket where the server has one (webserver5), otherwise
+// as PUT requests, one in flight, keeping only the latest colour.
+var pending = null, busy = false, ws = null, changed = 0;
+var picker = document.getElementById('rgb');
+var label = document.getElementById('value');
+
+function to10(c) {
+    return Math.round(c * 4.0117);
+}
+
+function hex(v) {
+    var s = Math.round(v / 4.0117).toString(16);
+    return s.length < 2 ? '0' + s : s;
+}
+
+function show(r, g, b) {
+    label.textContent = r + ', ' + g + ', ' + b;
+    // don't move the picker under the user's hand
+    if (Date.now() - changed > 500) picker.value = '#' + hex(r) + hex(g) + hex(b);
+}
+
+function connect() {
+    var socket = new WebSocket('ws://' + location.host + '/ws'), opened = false;
+    socket.binaryType = 'arraybuffer';
+    socket.onopen = function () { opened = true; ws = socket; };
+    socket.onmessage = function (e) {
+        var v = new DataView(e.data);
+        show(v.getUint16(0), v.getUint16(2), v.getUint16(4));
+    };
+    socket.onclose = function () {
+        ws = null;
+        if (opened) setTimeout(connect, 2000);
+    };
+}
+
+function send() {
+    if (pending === null) {
+        busy = false;
+        return;
+    }
+    busy = true;
+    var body = JSON.stringify({r: pending[0], g: pending[1], b: pending[2]});
+    pending = null;
+    fetch('/api/rgb', {method: 'PUT', headers: {'Content-Type': 'application/json'}, body: body}).then(send, send);
+}
+
+picker.addEventListener('input', function () {
+    var v = parseInt(picker.value.slice(1), 16);
+    var c = [to10(v >> 16), to10((v >> 8) & 255), to10(v & 255)];
+    changed = Date.now();
+    label.textContent = c.join(', ');
+    if (ws) {
+        var frame = new DataView(new ArrayBuffer(6));
+        frame.setUint16(0, c[0]); frame.setUint16(2, c[1]); frame.setUint16(4, c[2]);
+        ws.send(frame.buffer);
+    } else {
+        pending = c;
+        if (!busy) send();
+    }
+});
+
+fetch('/api/rgb').then(function (response) { return response.json(); }).then(function (c) {
+    show(c.r, c.g, c.b);
+});
+connect();
@@ -0,0 +1,65 @@
+"""
+Stream test frames to esp_01/ddp.py from a PC (CPython 3).
+
+    python3 ddp_send.py 192.168.1.171 --leds 240 --fps 60
+"""
+
+import argparse
+import math
+import socket
+import struct
+import time
+
+PORT = 4048
+MAX_DATA = 1440
+
+
+def packets(frame, seq):
+    """
+    Split one RGB frame into DDP packets, the last one with the push flag.
+    Yields (packet, seq) with the sequence number counting 1-15 per packet.
+    """
+    for offset in range(0, len(frame), MAX_DATA):
+        seq = seq % 15 + 1
+        data = frame[offset:offset + MAX_DATA]
+        flags = 0x40
+        if offset + MAX_DATA >= len(frame):
+            flags |= 0x01
+        yield struct.pack('>BBBBIH', flags, seq, 0x0b, 1, offset, len(data)) + data, seq
+
+
+def rainbow(leds, step):
+    frame = bytearray(leds * 3)
+    for i in range(leds):
+        angle = (i + step) * 2 * math.pi / leds
+        frame[i * 3] = int((1 + math.sin(angle)) * 127)
+        frame[i * 3 + 1] = int((1 + math.sin(angle + 2.1)) * 127)
+        frame[i * 3 + 2] = int((1 + math.sin(angle + 4.2)) * 127)
+    return bytes(frame)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('host')
+    parser.add_argument('--port', type=int, default=PORT)
+    parser.add_argument('--leds', type=int, default=240)
+    parser.add_argument('--fps', type=float, default=30)
+    parser.add_argument('--seconds', type=float, default=10)
+    args = parser.parse_args()
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    period = 1 / args.fps
+    frames = int(args.seconds * args.fps)
+    seq = 0
+    start = time.monotonic()
+    for step in range(frames):
+        for packet, seq in packets(rainbow(args.leds, step), seq):
+            sock.sendto(packet, (args.host, args.port))
+        delay = start + (step + 1) * period - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+    print('Sent {} frames in {:.1f} s'.format(frames, time.monotonic() - start))
+
+
+if __name__ == '__main__':
+    main()
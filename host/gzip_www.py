@@ -0,0 +1,43 @@
+"""
+Write precompressed name.gz files next to the web server's static files,
+for esp_01/staticfiles.py to send to clients that accept gzip. Files that
+don't get smaller (e.g. images) are skipped. Upload the .gz files with the
+originals.
+
+    python3 gzip_www.py ../esp_01/www
+"""
+
+import argparse
+import gzip
+import os
+
+
+def compress_dir(root, min_size=256):
+    for dirpath, dirnames, filenames in os.walk(root):
+        for filename in filenames:
+            if filename.endswith('.gz'):
+                continue
+            path = os.path.join(dirpath, filename)
+            with open(path, 'rb') as f:
+                data = f.read()
+            if len(data) < min_size:
+                continue
+            # mtime=0 so unchanged files compress to the same bytes
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) >= len(data):
+                continue
+            with open(path + '.gz', 'wb') as f:
+                f.write(compressed)
+            print('{}: {} -> {} bytes'.format(path, len(data), len(compressed)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('root', nargs='?', default=os.path.join(os.path.dirname(__file__), '..', 'esp_01', 'www'))
+    parser.add_argument('--min-size', type=int, default=256)
+    args = parser.parse_args()
+    compress_dir(args.root, args.min_size)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""
+Measure request latency of the esp_01 web servers from a PC (CPython 3),
+with a new connection per request versus one kept-alive connection.
+
+    python3 http_latency.py 192.168.1.171 --requests 100
+"""
+
+import argparse
+import http.client
+import statistics
+import time
+
+
+def colour_path(i):
+    # the kind of request the jscolor page sends while dragging
+    return '/?r={}&g={}&b={}'.format(i % 1024, (i * 7) % 1024, (i * 13) % 1024)
+
+
+def timed(request):
+    start = time.perf_counter()
+    request()
+    return (time.perf_counter() - start) * 1000
+
+
+def run_close(host, port, count):
+    def request(i):
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        conn.request('GET', colour_path(i), headers={'Connection': 'close'})
+        conn.getresponse().read()
+        conn.close()
+    return [timed(lambda: request(i)) for i in range(count)]
+
+
+def run_keep_alive(host, port, count):
+    conn = http.client.HTTPConnection(host, port, timeout=10)
+
+    def request(i):
+        conn.request('GET', colour_path(i))
+        response = conn.getresponse()
+        response.read()
+        if response.getheader('Connection', '').lower() == 'close':
+            conn.close()  # server's request cap, reconnect on the next one
+    try:
+        return [timed(lambda: request(i)) for i in range(count)]
+    finally:
+        conn.close()
+
+
+def report(name, times):
+    times = sorted(times)
+    print('{:11} mean {:7.2f} ms  p50 {:7.2f} ms  p95 {:7.2f} ms'.format(
+        name, statistics.mean(times), times[len(times) // 2], times[int(len(times) * 0.95)]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('host')
+    parser.add_argument('--port', type=int, default=80)
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    report('close', run_close(args.host, args.port, args.requests))
+    report('keep-alive', run_keep_alive(args.host, args.port, args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+"""
+Count the socket calls the esp_01 web servers make per request. The server
+code runs on the PC with the hardware stubbed (host/stubs) and its end of
+the connection wrapped in a CountingSocket; a client thread sends requests
+on one kept-alive connection.
+
+    python3 http_syscalls.py webserver4 --requests 20
+    python3 http_syscalls.py webserver3 --method POST --path /on
+    python3 http_syscalls.py webserver4 --revalidate
+
+With --revalidate the client sends back the ETag it got, like a browser
+revisiting the page.
+"""
+
+import argparse
+import collections
+import os
+import socket
+import sys
+import threading
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ESP_01 = os.path.join(HERE, '..', 'esp_01')
+sys.path[:0] = [os.path.join(HERE, 'stubs'), ESP_01]
+
+
+class CountingSocket:
+    """
+    Wraps a socket and counts the calls that are syscalls on the device.
+    read() and readline() are unbuffered like MicroPython's socket stream,
+    so readline() costs one recv per byte.
+    """
+    def __init__(self, sock):
+        self.sock = sock
+        self.calls = collections.Counter()
+
+    def recv(self, size):
+        self.calls['recv'] += 1
+        return self.sock.recv(size)
+
+    def recv_into(self, buf, size=0):
+        self.calls['recv'] += 1
+        return self.sock.recv_into(buf, size)
+
+    readinto = recv_into
+
+    def read(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.recv(size - len(data))
+            if not chunk:
+                break
+            data += chunk
+        return data
+
+    def readline(self):
+        line = b''
+        while not line.endswith(b'\n'):
+            c = self.recv(1)
+            if not c:
+                break
+            line += c
+        return line
+
+    def send(self, data):
+        self.calls['send'] += 1
+        sent = self.sock.send(data)
+        self.calls['bytes'] += sent
+        return sent
+
+    def sendall(self, data):
+        self.calls['send'] += 1
+        self.calls['bytes'] += len(data)
+        return self.sock.sendall(data)
+
+    def write(self, data):
+        if isinstance(data, str):
+            data = data.encode()
+        return self.sendall(data)
+
+    def settimeout(self, timeout):
+        self.sock.settimeout(timeout)
+
+    def close(self):
+        self.sock.close()
+
+
+def client(sock, method, path, count, revalidate=False):
+    request = '{} {} HTTP/1.1\r\nHost: esp\r\nUser-Agent: http_syscalls\r\nAccept-Encoding: gzip\r\n{}\r\n'
+    etag = None
+    with sock, sock.makefile('rb') as f:
+        for i in range(count):
+            condition = 'If-None-Match: {}\r\n'.format(etag) if etag else ''
+            sock.sendall(request.format(method, path, condition).encode())
+            length = 0
+            while True:
+                line = f.readline()
+                if line in (b'\r\n', b''):
+                    break
+                if line.lower().startswith(b'content-length:'):
+                    length = int(line[15:])
+                elif line.lower().startswith(b'etag:') and revalidate:
+                    etag = line[5:].strip().decode()
+            f.read(length)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('server', choices=['webserver3', 'webserver4'])
+    parser.add_argument('--method', default='GET')
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--requests', type=int, default=10)
+    parser.add_argument('--revalidate', action='store_true')
+    args = parser.parse_args()
+
+    os.chdir(ESP_01)  # like the device's flash, where www/ is
+    module = __import__(args.server)
+    ws = module.WebServer()
+    ws.MAX_REQUESTS = args.requests + 1
+
+    server_end, client_end = socket.socketpair()
+    conn = CountingSocket(server_end)
+    thread = threading.Thread(target=client,
+                              args=(client_end, args.method, args.path, args.requests, args.revalidate))
+    thread.start()
+    ws.handle(conn, ('127.0.0.1', 0))
+    thread.join()
+    conn.close()
+
+    for name in ('recv', 'send'):
+        print('{:5} {:6.1f} calls per request'.format(name, conn.calls[name] / args.requests))
+    print('sent  {:6.0f} bytes per request'.format(conn.calls['bytes'] / args.requests))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+"""
+Load test the esp_01 web servers on the PC. The server runs unchanged in a
+child process, with the hardware stubbed (host/stubs) and tracemalloc on
+for its peak memory. Asyncio clients here drive it in one of these
+scenarios:
+
+    keepalive  --clients connections, each sending --requests requests on
+               a kept-alive connection (reconnecting when the server closes)
+    burst      --clients clients at once, each request on a new connection
+    slowloris  keepalive, while --slow connections trickle in headers one
+               byte at a time and never finish them
+
+Requests are a mix for the server (page, API reads and writes) drawn from
+a random generator with a fixed --seed, and every client sends a fixed
+number of them, so runs before and after a change do the same work:
+
+    python3 loadtest.py webserver4 --scenario keepalive --clients 4 --requests 200
+    python3 loadtest.py webserver3 --scenario slowloris --slow 2 --json before.json
+    python3 loadtest.py webserver4 --compare before.json
+
+idle_kb is the server's traced memory after setup and peak_kb the most it
+allocated on top of that during the run. Absolute numbers are the PC's
+(CPython objects are larger), not the ESP8266's; compare runs on the same
+machine.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ESP_01 = os.path.join(HERE, '..', 'esp_01')
+
+# (method, path, body) mixes per server
+MIXES = {
+    'webserver3': [
+        (3, 'GET', '/', None),
+        (1, 'POST', '/on', b''),
+        (1, 'POST', '/off', b''),
+    ],
+    'webserver4': [
+        (2, 'GET', '/', None),
+        (1, 'GET', '/app.js', None),
+        (3, 'GET', '/api/rgb', None),
+        (4, 'PUT', '/api/rgb', 'json'),
+    ],
+}
+MIXES['webserver5'] = MIXES['webserver4']
+
+
+def serve(name, port):
+    """
+    Child process: run the server until stdin closes, then print its traced
+    memory (idle after setup, now, peak) as JSON. The peak counts from the line the harness sends
+    after warm_up(), so imports and setup aren't in it.
+    """
+    import threading
+    import tracemalloc
+
+    sys.path[:0] = [os.path.join(HERE, 'stubs'), ESP_01]
+    os.chdir(ESP_01)  # like the device's flash, where www/ is
+    tracemalloc.start()
+    module = __import__(name)
+
+    if name == 'webserver5':
+        def run():
+            async def main():
+                server = module.AsyncWebServer()
+                await server.start('127.0.0.1', port)
+                while True:
+                    await asyncio.sleep(3600)
+            asyncio.run(main())
+    else:
+        server = module.WebServer()
+
+        def run():
+            server.run(port)
+
+    # the servers print per request; keep stdout for the result
+    sys.stdout = open(os.devnull, 'w')
+    threading.Thread(target=run, daemon=True).start()
+    sys.stdin.readline()
+    tracemalloc.reset_peak()
+    (idle, _) = tracemalloc.get_traced_memory()
+    sys.stdin.read()
+    (current, peak) = tracemalloc.get_traced_memory()
+    sys.__stdout__.write(json.dumps({'idle': idle, 'current': current, 'peak': peak}) + '\n')
+    sys.__stdout__.flush()
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def warm_up(port, mix, child, timeout=10.0):
+    """
+    Wait for the server to answer, then send it one request of each kind,
+    so lazy imports and first-use allocations aren't measured.
+    """
+    end = time.monotonic() + timeout
+    while child.poll() is None:
+        try:
+            for (_, method, path, body) in mix:
+                with socket.create_connection(('127.0.0.1', port), timeout=timeout) as s:
+                    s.sendall(encode(method, path, b'{"r":0,"g":0,"b":0}' if body == 'json' else body, close=True))
+                    while s.recv(4096):
+                        pass
+            return True
+        except OSError:
+            if time.monotonic() > end:
+                break
+            time.sleep(0.1)
+    return False
+
+
+def make_requests(mix, count, rng):
+    weights = [m[0] for m in mix]
+    requests = []
+    for entry in rng.choices(mix, weights, k=count):
+        (_, method, path, body) = entry
+        if body == 'json':
+            body = json.dumps({'r': rng.randrange(1024), 'g': rng.randrange(1024), 'b': rng.randrange(1024)}).encode()
+        requests.append((method, path, body))
+    return requests
+
+
+def encode(method, path, body, close=False):
+    head = '{} {} HTTP/1.1\r\nHost: esp\r\nAccept-Encoding: gzip\r\n'.format(method, path)
+    if body is not None:
+        head += 'Content-Type: application/json\r\nContent-Length: {}\r\n'.format(len(body))
+    if close:
+        head += 'Connection: close\r\n'
+    return (head + '\r\n').encode() + (body or b'')
+
+
+async def read_response(reader):
+    """
+    Read one response. Returns (status, server closes the connection).
+    """
+    head = await reader.readuntil(b'\r\n\r\n')
+    lines = head.decode().split('\r\n')
+    status = int(lines[0].split(' ')[1])
+    length = 0
+    close = False
+    for line in lines[1:]:
+        (name, _, value) = line.partition(':')
+        name = name.lower()
+        if name == 'content-length':
+            length = int(value)
+        elif name == 'connection':
+            close = value.strip().lower() == 'close'
+    if length:
+        await reader.readexactly(length)
+    return (status, close)
+
+
+class Results:
+    def __init__(self):
+        self.latencies = []
+        self.errors = 0
+        self.statuses = {}
+        self.connections = 0
+
+    def add(self, status, seconds):
+        self.latencies.append(seconds * 1000)
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+async def keepalive_client(port, requests, results, timeout):
+    reader = writer = None
+    for (method, path, body) in requests:
+        try:
+            if writer is None:
+                (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+                results.connections += 1
+            start = time.perf_counter()
+            writer.write(encode(method, path, body))
+            (status, close) = await asyncio.wait_for(read_response(reader), timeout)
+            results.add(status, time.perf_counter() - start)
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            results.errors += 1
+            close = True
+        if close and writer is not None:
+            writer.close()
+            writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def burst_client(port, requests, results, timeout):
+    for (method, path, body) in requests:
+        start = time.perf_counter()
+        try:
+            (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+            results.connections += 1
+            writer.write(encode(method, path, body, close=True))
+            (status, _) = await asyncio.wait_for(read_response(reader), timeout)
+            results.add(status, time.perf_counter() - start)
+            writer.close()
+        except (OSError, asyncio.IncompleteReadError, asyncio.TimeoutError):
+            results.errors += 1
+
+
+async def slowloris_client(port, stop, interval):
+    # reconnects whenever the server gives up on it
+    request = encode('GET', '/', None)[:-2]  # never sends the final blank line
+    while not stop.is_set():
+        try:
+            (reader, writer) = await asyncio.open_connection('127.0.0.1', port)
+            for i in range(len(request)):
+                if stop.is_set():
+                    break
+                writer.write(request[i:i + 1])
+                await writer.drain()
+                await asyncio.sleep(interval)
+            writer.close()
+        except OSError:
+            await asyncio.sleep(interval)
+
+
+async def run_scenario(args, port):
+    rng = random.Random(args.seed)
+    mix = MIXES[args.server]
+    workload = [make_requests(mix, args.requests, rng) for i in range(args.clients)]
+    results = Results()
+
+    stop = asyncio.Event()
+    slow = []
+    if args.scenario == 'slowloris':
+        slow = [asyncio.create_task(slowloris_client(port, stop, args.slow_interval)) for i in range(args.slow)]
+        await asyncio.sleep(args.slow_interval * 2)  # let them take their connections
+
+    client = burst_client if args.scenario == 'burst' else keepalive_client
+    start = time.perf_counter()
+    await asyncio.gather(*[client(port, requests, results, args.timeout) for requests in workload])
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    for task in slow:
+        task.cancel()
+    await asyncio.gather(*slow, return_exceptions=True)
+    return (results, elapsed)
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def summary(args, results, elapsed, memory):
+    latencies = results.latencies
+    return {
+        'server': args.server,
+        'scenario': args.scenario,
+        'clients': args.clients,
+        'requests': args.clients * args.requests,
+        'seed': args.seed,
+        'ok': len(latencies),
+        'errors': results.errors,
+        'statuses': {str(k): v for (k, v) in sorted(results.statuses.items())},
+        'connections': results.connections,
+        'rps': len(latencies) / elapsed if elapsed else 0.0,
+        'p50_ms': percentile(latencies, 50),
+        'p95_ms': percentile(latencies, 95),
+        'p99_ms': percentile(latencies, 99),
+        'max_ms': max(latencies) if latencies else 0.0,
+        'idle_kb': memory['idle'] / 1024,
+        'peak_kb': (memory['peak'] - memory['idle']) / 1024,  # above idle
+    }
+
+
+def report(result, before=None):
+    keys = ('rps', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'idle_kb', 'peak_kb')
+    print('{server} {scenario}: {clients} clients, {requests} requests, seed {seed}'.format(**result))
+    print('  ok {ok}  errors {errors}  connections {connections}  statuses {statuses}'.format(**result))
+    for key in keys:
+        line = '  {:8} {:10.2f}'.format(key, result[key])
+        if before is not None and before.get(key):
+            line += '   before {:10.2f}  ({:+.1f}%)'.format(before[key], (result[key] / before[key] - 1) * 100)
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('server', choices=sorted(MIXES))
+    parser.add_argument('--scenario', choices=['keepalive', 'burst', 'slowloris'], default='keepalive')
+    parser.add_argument('--clients', type=int, default=4)
+    parser.add_argument('--requests', type=int, default=100, help='requests per client')
+    parser.add_argument('--slow', type=int, default=2, help='slow-loris connections')
+    parser.add_argument('--slow-interval', type=float, default=0.2, help='seconds between slow-loris bytes')
+    parser.add_argument('--timeout', type=float, default=10.0, help='seconds to wait for a response')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--port', type=int, default=0, help='server port, a free one if 0')
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='results file of an earlier run to compare with')
+    parser.add_argument('--serve', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.server, args.port)
+        return
+
+    port = args.port or free_port()
+    child = subprocess.Popen([sys.executable, os.path.abspath(__file__), args.server, '--serve', '--port', str(port)],
+                             stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+    try:
+        if not warm_up(port, MIXES[args.server], child):
+            sys.exit('server failed to start')
+        child.stdin.write(b'start\n')
+        child.stdin.flush()
+        (results, elapsed) = asyncio.run(run_scenario(args, port))
+        (out, _) = child.communicate(timeout=30)
+        memory = json.loads(out.decode().strip().splitlines()[-1])
+    finally:
+        if child.poll() is None:
+            child.kill()
+
+    result = summary(args, results, elapsed, memory)
+    before = None
+    if args.compare:
+        with open(args.compare) as f:
+            before = json.load(f)
+    report(result, before)
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
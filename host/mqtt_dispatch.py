@@ -0,0 +1,120 @@
+"""
+Benchmark handling of received MQTT commands on a PC (CPython 3): the
+if/elif chain Announce.mqtt_process_sub used to have (decode topic and
+payload, print them, json.loads, compare keys) against the registry in
+esp_01/mqtt_commands.py, with JSON and with binary payloads.
+
+Handlers only count calls, so this is the cost of getting from a message
+to its handler. Rates are the PC's; compare the paths with each other.
+
+    python3 mqtt_dispatch.py --messages 100000
+"""
+
+import argparse
+import json
+import os
+import struct
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, '..', 'esp_01')]
+
+import mqtt_commands  # noqa: E402
+
+TOPIC = b'assist/5CCF7F000000'
+BINARY_TOPIC = TOPIC + b'/b'
+
+# the same commands in both forms
+JSON_MESSAGES = [b'{"led":"ON"}', b'{"led":"OFF"}', b'{"cmd":"STATUS"}', b'{"time":"2017:8:23:1:12:48:0:0"}']
+BINARY_MESSAGES = [b'\x01\x01', b'\x01\x00', b'\x02', b'\x03' + struct.pack('>HBBBBBBB', 2017, 8, 23, 1, 12, 48, 0, 0)]
+
+
+class Handlers:
+    def __init__(self):
+        self.calls = 0
+
+    def led(self, on):
+        self.calls += 1
+
+    def status(self):
+        self.calls += 1
+
+    def time(self, *datetime):
+        self.calls += 1
+
+
+def old_path(handlers, out):
+    # mqtt2.Announce.mqtt_process_sub before the registry, display calls left out
+    def process(topic, msg):
+        channel = topic.decode("utf-8")
+        payload = msg.decode("utf-8")
+        print("{}: {}".format(channel, payload), file=out)
+
+        data = json.loads(payload)
+        if 'led' in data:
+            if data['led'] == 'ON':
+                handlers.led(1)
+            elif data['led'] == 'OFF':
+                handlers.led(0)
+        elif 'cmd' in data:
+            if data['cmd'] == 'STATUS':
+                handlers.status()
+        elif 'time' in data:
+            handlers.time(*map(int, data['time'].split(':')))
+    return process
+
+
+def registry(handlers):
+    commands = mqtt_commands.Commands()
+    commands.add_json('led', lambda value: handlers.led(value == 'ON'))
+    commands.add_json('cmd', lambda value: handlers.status() if value == 'STATUS' else None)
+    commands.add_json('time', lambda value: handlers.time(*map(int, value.split(':'))))
+    commands.add_binary(1, 'B', handlers.led)
+    commands.add_binary(2, '', handlers.status)
+    commands.add_binary(3, '>HBBBBBBB', handlers.time)
+
+    def process(topic, msg):
+        commands.dispatch(msg, topic == BINARY_TOPIC)
+    return process
+
+
+def measure(process, topic, messages, count):
+    start = time.perf_counter()
+    for i in range(count):
+        process(topic, messages[i & 3])
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for i in range(1000):
+        process(topic, messages[i & 3])
+    (_, peak) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return (count / elapsed, peak)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=100000)
+    args = parser.parse_args()
+
+    with open(os.devnull, 'w') as out:
+        paths = [
+            ('if/elif, JSON', old_path, TOPIC, JSON_MESSAGES),
+            ('registry, JSON', None, TOPIC, JSON_MESSAGES),
+            ('registry, binary', None, BINARY_TOPIC, BINARY_MESSAGES),
+        ]
+        base = None
+        for (name, make, topic, messages) in paths:
+            handlers = Handlers()
+            process = make(handlers, out) if make else registry(handlers)
+            (rate, peak) = measure(process, topic, messages, args.messages)
+            assert handlers.calls == args.messages + 1000, name
+            base = base or rate
+            size = sum(map(len, messages)) / len(messages)
+            print('{:18} {:10.0f} msg/s  x{:4.1f}  {:5.1f} bytes/msg  peak {:5} B'.format(name, rate, rate / base, size, peak))
+
+
+if __name__ == '__main__':
+    main()
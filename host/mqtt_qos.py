@@ -0,0 +1,114 @@
+"""
+Benchmark QoS 1 publishing in esp_01/mqtt_async.py on a PC (CPython 3):
+how long it takes to get --messages messages acked with an in-flight
+window of 1 (stop-and-wait) and larger ones.
+
+A stand-in broker in this process acks every PUBLISH with a PUBACK after
+--rtt ms, the round trip over Wi-Fi to the broker and back. MQTTLoop runs
+unchanged on the other end of the TCP connection (host/stubs for utime).
+
+    python3 mqtt_qos.py --messages 200 --rtt 20 --windows 1 2 4 8
+    python3 mqtt_qos.py --journal  # with the flash outbox (a temp file here)
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import tempfile
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, 'stubs'), os.path.join(HERE, '..', 'esp_01')]
+
+import mqtt_async  # noqa: E402
+import mqtt_journal  # noqa: E402
+
+
+class Client:
+    # the parts of umqtt.simple.MQTTClient that MQTTLoop uses
+    keepalive = 0
+
+    def __init__(self, sock):
+        self.sock = sock
+
+    def cb(self, topic, msg):
+        pass
+
+
+async def broker(reader, writer, rtt, done):
+    loop = asyncio.get_running_loop()
+    while True:
+        try:
+            kind = (await reader.readexactly(1))[0]
+            length = 0
+            shift = 0
+            while True:
+                byte = (await reader.readexactly(1))[0]
+                length |= (byte & 0x7f) << shift
+                shift += 7
+                if not byte & 0x80:
+                    break
+            body = await reader.readexactly(length)
+        except (asyncio.IncompleteReadError, OSError):
+            writer.close()
+            done.set()
+            return
+        if kind & 0xf6 == 0x32:  # PUBLISH, QoS 1
+            topic_len = body[0] << 8 | body[1]
+            puback = bytes((0x40, 2)) + body[2 + topic_len:4 + topic_len]
+            loop.call_later(rtt / 1000, writer.write, puback)
+
+
+async def run(window, messages, rtt, journal):
+    done = asyncio.Event()
+    server = await asyncio.start_server(lambda r, w: broker(r, w, rtt, done), '127.0.0.1', 0)
+    port = server.sockets[0].getsockname()[1]
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    loop = mqtt_async.MQTTLoop(Client(sock), outbox_size=messages, window=window, journal=journal)
+    task = asyncio.create_task(loop.run())
+
+    start = time.perf_counter()
+    for i in range(messages):
+        loop.publish('announce/notify', '{{"mac":"5CCF7F000000","cmd":"HELP","n":{}}}'.format(i), qos=1)
+    while loop.outbox or loop.inflight:
+        await asyncio.sleep(0.001)
+    elapsed = time.perf_counter() - start
+
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    sock.close()
+    await done.wait()
+    server.close()
+    await server.wait_closed()
+    return (elapsed, loop.acked, loop.retransmits)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--rtt', type=float, default=20.0, help='broker round trip in ms')
+    parser.add_argument('--windows', type=int, nargs='+', default=[1, 2, 4, 8])
+    parser.add_argument('--journal', action='store_true', help='keep messages in an outbox file until acked')
+    args = parser.parse_args()
+
+    print('{} QoS 1 messages, {} ms round trip{}'.format(args.messages, args.rtt, ', journal' if args.journal else ''))
+    for window in args.windows:
+        journal = None
+        if args.journal:
+            journal = mqtt_journal.Journal(os.path.join(tempfile.mkdtemp(), 'outbox.bin'))
+        (elapsed, acked, retransmits) = asyncio.run(run(window, args.messages, args.rtt, journal))
+        print('  window {:3}  {:8.1f} ms  {:8.1f} msg/s  acked {}  retransmits {}'.format(
+            window, elapsed * 1000, acked / elapsed, acked, retransmits))
+        if journal is not None:
+            journal.close()
+            print('               outbox file {} bytes'.format(os.path.getsize(journal.path)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""
+Stand-in for the MicroPython machine module, so esp_01 code can run on a PC.
+Outputs only remember their last value; Timer callbacks run on a thread.
+"""
+
+import threading
+
+
+class Pin:
+    IN = 0
+    OUT = 1
+    PULL_UP = 2
+    IRQ_FALLING = 1
+    IRQ_RISING = 2
+
+    def __init__(self, id, mode=-1, pull=-1, value=None):
+        self.id = id
+        self.v = value or 0
+
+    def init(self, mode=-1, pull=-1, value=None):
+        if value is not None:
+            self.v = value
+
+    def value(self, v=None):
+        if v is None:
+            return self.v
+        self.v = v
+
+    def on(self):
+        self.v = 1
+
+    def off(self):
+        self.v = 0
+
+    def irq(self, handler=None, trigger=None):
+        self.handler = handler
+
+
+class PWM:
+    def __init__(self, pin, freq=500, duty=0):
+        self.pin = pin
+        self.f = freq
+        self.d = duty
+
+    def freq(self, f=None):
+        if f is None:
+            return self.f
+        self.f = f
+
+    def duty(self, d=None):
+        if d is None:
+            return self.d
+        self.d = d
+
+    def deinit(self):
+        pass
+
+
+class Timer:
+    ONE_SHOT = 0
+    PERIODIC = 1
+
+    def __init__(self, id=-1):
+        self.id = id
+        self.thread = None
+
+    def init(self, mode=PERIODIC, period=-1, callback=None):
+        self.deinit()
+
+        def fire():
+            if self.thread is not thread:
+                return
+            if mode == Timer.PERIODIC:
+                self.init(mode, period, callback)
+            callback(self)
+
+        thread = threading.Timer(period / 1000, fire)
+        thread.daemon = True
+        self.thread = thread
+        thread.start()
+
+    def deinit(self):
+        if self.thread is not None:
+            self.thread.cancel()
+            self.thread = None
+
+
+def unique_id():
+    return b'\x00\x00\x00\x00'
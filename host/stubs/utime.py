@@ -0,0 +1,34 @@
+"""
+Stand-in for the MicroPython utime module, so esp_01 code can run on a PC.
+Ticks don't wrap.
+"""
+
+import time as _time
+
+
+def ticks_ms():
+    return int(_time.perf_counter() * 1000)
+
+
+def ticks_us():
+    return int(_time.perf_counter() * 1000000)
+
+
+def ticks_diff(a, b):
+    return a - b
+
+
+def ticks_add(a, b):
+    return a + b
+
+
+def sleep_ms(ms):
+    _time.sleep(ms / 1000)
+
+
+def sleep_us(us):
+    _time.sleep(us / 1000000)
+
+
+sleep = _time.sleep
+time = _time.time
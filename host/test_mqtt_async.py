@@ -0,0 +1,51 @@
+"""
+Tests for the Outbox in esp_01/mqtt_async.py on a PC (CPython 3):
+
+    python3 -m unittest discover host
+"""
+
+import os
+import sys
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, 'stubs'), os.path.join(HERE, '..', 'esp_01')]
+
+import mqtt_async  # noqa: E402
+
+
+def message(name, qos):
+    return (name, b'', False, qos, None)
+
+
+class OutboxTest(unittest.TestCase):
+    def drain(self, outbox):
+        return [outbox.pop()[0] for i in range(len(outbox))]
+
+    def test_fifo(self):
+        outbox = mqtt_async.Outbox(3)
+        for name in 'abc':
+            self.assertIsNone(outbox.push(message(name, 0)))
+        self.assertEqual(self.drain(outbox), ['a', 'b', 'c'])
+
+    def test_full_drops_qos0_first(self):
+        outbox = mqtt_async.Outbox(4)
+        outbox.push(message('x', 0))
+        outbox.pop()  # head not at slot 0
+        for (name, qos) in (('a', 1), ('b', 0), ('c', 1), ('d', 0)):
+            outbox.push(message(name, qos))
+        self.assertEqual(outbox.push(message('e', 0))[0], 'b')
+        self.assertEqual(outbox.push(message('f', 1))[0], 'd')
+        self.assertEqual(self.drain(outbox), ['a', 'c', 'e', 'f'])
+        self.assertEqual(outbox.dropped, 2)
+
+    def test_full_of_qos1_drops_oldest(self):
+        outbox = mqtt_async.Outbox(2)
+        outbox.push(message('a', 1))
+        outbox.push(message('b', 1))
+        self.assertEqual(outbox.push(message('c', 0))[0], 'a')
+        self.assertEqual(self.drain(outbox), ['b', 'c'])
+
+
+if __name__ == '__main__':
+    unittest.main()
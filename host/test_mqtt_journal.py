@@ -0,0 +1,114 @@
+"""
+Tests for esp_01/mqtt_journal.py on a PC (CPython 3):
+
+    python3 -m unittest discover host
+"""
+
+import os
+import struct
+import sys
+import tempfile
+import unittest
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path[:0] = [os.path.join(HERE, 'stubs'), os.path.join(HERE, '..', 'esp_01')]
+
+import mqtt_journal  # noqa: E402
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+        os.remove(self.path)
+        self.journal = mqtt_journal.Journal(self.path)
+
+    def tearDown(self):
+        self.journal.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def reopen(self):
+        self.journal.close()
+        self.journal = mqtt_journal.Journal(self.path)
+        return self.journal.load()
+
+    def test_missing_file(self):
+        self.assertEqual(self.journal.load(), [])
+
+    def test_unacked_survive(self):
+        first = self.journal.append('a/1', 'one')
+        second = self.journal.append('a/2', b'two', retain=True)
+        self.assertEqual(self.reopen(), [(first, b'a/1', b'one', 0), (second, b'a/2', b'two', 1)])
+
+    def test_ack_matches_seq(self):
+        seqs = [self.journal.append('t', str(i)) for i in range(4)]
+        self.journal.ack(seqs[2])
+        self.journal.ack(seqs[0])
+        self.assertEqual([m[0] for m in self.reopen()], [seqs[1], seqs[3]])
+
+    def test_ack_of_unknown_seq(self):
+        seq = self.journal.append('t', 'kept')
+        self.journal.ack(seq + 100)
+        self.journal.ack(seq - 1)
+        self.assertEqual(self.journal.pending, {seq})
+        self.assertEqual([m[0] for m in self.reopen()], [seq])
+
+    def test_ack_twice(self):
+        self.journal.MAX_SIZE = 0
+        first = self.journal.append('t', 'acked')
+        second = self.journal.append('t', 'kept')
+        self.journal.ack(first)
+        self.journal.ack(first)
+        self.assertEqual(self.journal.pending, {second})
+        self.assertEqual([m[0] for m in self.reopen()], [second])
+
+    def test_long_topic(self):
+        with self.assertRaises(ValueError):
+            self.journal.append('t' * 256, 'x')
+        self.journal.append('t' * 255, 'x')
+        self.assertEqual(len(self.reopen()[0][1]), 255)
+
+    def test_truncated_record(self):
+        seq = self.journal.append('t', 'whole')
+        self.journal.append('t', 'cut short')
+        self.journal.close()
+        size = os.path.getsize(self.path)
+        with open(self.path, 'r+b') as f:
+            f.truncate(size - 3)
+        self.assertEqual(self.reopen(), [(seq, b't', b'whole', 0)])
+
+    def test_truncated_header(self):
+        seq = self.journal.append('t', 'whole')
+        self.journal.close()
+        with open(self.path, 'ab') as f:
+            f.write(bytes((mqtt_journal.PUBLISH, 0, 9)))
+        self.assertEqual([m[0] for m in self.reopen()], [seq])
+
+    def test_load_compacts(self):
+        seqs = [self.journal.append('t', 'message {}'.format(i)) for i in range(3)]
+        self.journal.ack(seqs[0])
+        self.journal.ack(seqs[1])
+        self.reopen()
+        record = mqtt_journal.HEADER_SIZE + len(b't') + len(b'message 2')
+        self.assertEqual(os.path.getsize(self.path), record)
+        with open(self.path, 'rb') as f:
+            self.assertEqual(struct.unpack(mqtt_journal.HEADER, f.read(mqtt_journal.HEADER_SIZE)),
+                             (mqtt_journal.PUBLISH, 0, seqs[2], 1, 9))
+
+    def test_seq_continues_after_load(self):
+        seqs = [self.journal.append('t', 'x') for i in range(3)]
+        self.reopen()
+        self.assertEqual(self.journal.append('t', 'y'), seqs[-1] + 1)
+
+    def test_emptied_when_all_acked(self):
+        self.journal.MAX_SIZE = 64
+        seqs = [self.journal.append('t', 'x' * 20) for i in range(4)]
+        for seq in seqs:
+            self.journal.ack(seq)
+        self.assertEqual(os.path.getsize(self.path), 0)
+        self.assertEqual(self.reopen(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()